@@ -5,9 +5,8 @@ import shutil
 import pytest
 
 from ukconstituencystreetbystreet import config
-from ukconstituencystreetbystreet.db import cacher
 from ukconstituencystreetbystreet.db.db_repr_sqlite import (
-    Base,
+    ensure_schema,
     get_engine,
 )
 
@@ -26,7 +25,7 @@ TEST_CACHE_DB_FILE = TEST_STORAGE_FOLDER / "test.sqlite"
 
 
 @pytest.fixture(autouse=True, scope="session")
-def setup_config():
+def setup_config(setup_folders):
     config.MAIN_STORAGE_FOLDER = TEST_STORAGE_FOLDER
     folder_for_data = TEST_CSV_FOLDER
 
@@ -37,10 +36,12 @@ def setup_config():
         "(December_2022)_Names_and_Codes"
         "_in_the_United_Kingdom.csv",
         "os_openname_csv_folder": "os_openname_csv_folder",
+        "os_open_roads_geopackage": "oproad_gb.gpkg",
         "ons_postcodes_csv": "NSPL21_FEB_2023_UK.csv",
         "ons_local_auth_csv": "Local_Authority_Districts_December_2023_Boundaries_UK_BFE_6619220630419597412.csv",
         "ons_oa_csv": "Output_Areas_2021_EW_BFE_V9_-4867123113532843655.csv",
-        "ons_msoa_csv": "MSOA_2021_EW_BFE_V7_4158844050038459526.csv",
+        "ons_msoa_geojson": "MSOA_2021_EW_BGC_V2_1370945015033551734.geojson",
+        "ons_msoa_readble_names_csv": "MSOA-Names-2.2.csv",
         "census_age_by_msoa_csv": "Census Age Data by MSOA.csv",
         "census_age_by_oa_csv": "census2021-ts007a-oa.csv",
     }
@@ -54,10 +55,14 @@ def setup_config():
         "allow_getting_full_address": "no",
         "get_address_io_api_key": "",
         "get_address_io_admin_key": "",
-        "max_requests_per_5_mins": 2000,
+        "max_requests_per_5_mins": "2000",
     }
 
-    config_parser["DATA_OPTS"] = {"constituencies": "", "local_authorities": ""}
+    config_parser["DATA_OPTS"] = {
+        "constituencies": "",
+        "local_authorities": "",
+        "msoas": "",
+    }
 
     input_conf = config_parser["INPUT"]
     output_conf = config_parser["OUTPUT"]
@@ -74,11 +79,19 @@ def setup_config():
                 folder_for_data / input_conf["ons_postcodes_csv"]
             ).resolve(),
             os_openname_csv_folder=pathlib.Path(input_conf["os_openname_csv_folder"]),
+            os_open_roads_geopackage=(
+                folder_for_data / input_conf["os_open_roads_geopackage"]
+            ).resolve(),
             ons_local_auth_csv=(
                 folder_for_data / input_conf["ons_local_auth_csv"]
             ).resolve(),
             ons_oa_csv=(folder_for_data / input_conf["ons_oa_csv"]).resolve(),
-            ons_msoa_csv=(folder_for_data / input_conf["ons_msoa_csv"]).resolve(),
+            ons_msoa_readble_names_csv=(
+                folder_for_data / input_conf["ons_msoa_readble_names_csv"]
+            ).resolve(),
+            ons_msoa_geojson=(
+                folder_for_data / input_conf["ons_msoa_geojson"]
+            ).resolve(),
             census_age_by_msoa_csv=(
                 folder_for_data / input_conf["census_age_by_msoa_csv"]
             ).resolve(),
@@ -96,11 +109,12 @@ def setup_config():
             ),
             get_address_io_api_key=scraping_conf["get_address_io_api_key"],
             get_address_io_admin_key=scraping_conf["get_address_io_admin_key"],
-            max_requests_per_5_mins=scraping_conf["max_requests_per_5_mins"],
+            max_requests_per_5_mins=int(scraping_conf["max_requests_per_5_mins"]),
         ),
         data_opts=config.DataOptsConfig(
             constituencies=str(data_opts["constituencies"]).split(","),
             local_authorities=str(data_opts["local_authorities"]).split(","),
+            msoas=str(data_opts["msoas"]).split(","),
         ),
     )
 
@@ -111,11 +125,6 @@ def get_test_engine():
     return get_engine(TEST_CACHE_DB_FILE)
 
 
-@pytest.fixture(autouse=True, scope="session")
-def setup_db():
-    cacher.create_all(get_test_engine())
-
-
 @pytest.fixture(autouse=True, scope="session")
 def setup_folders():
     # Clean up before starting
@@ -124,3 +133,9 @@ def setup_folders():
     TEST_STORAGE_FOLDER.mkdir(parents=True, exist_ok=True)
 
     yield
+
+
+@pytest.fixture(autouse=True, scope="session")
+def setup_db(setup_folders):
+    # Only after setup_folders, otherwise the new database gets deleted
+    ensure_schema(get_test_engine())
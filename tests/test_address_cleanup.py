@@ -0,0 +1,168 @@
+from collections import namedtuple
+from typing import Optional, Tuple
+
+import ahocorasick
+import pytest
+
+from ukconstituencystreetbystreet.multiprocess_address_cleanup import (
+    HOUSE_NUM_OR_NAME_KEY,
+    ID_KEY,
+    THOROUGHFARE_KEY,
+    _index_road_words,
+    _match_after_house_number,
+    _match_close_road,
+    _match_found_road,
+    _match_last_line,
+    cleanup_addresses,
+)
+
+# Stands in for a row selected by select_addresses_for_cleanup
+AddressRow = namedtuple(
+    "AddressRow",
+    [
+        "get_address_io_id",
+        "line_1",
+        "line_2",
+        "line_3",
+        "line_4",
+        "thoroughfare_or_desc",
+        "house_num_or_name",
+    ],
+)
+
+ROADS = ["High Street", "Marlborough Gardens", "Church Lane", "Station Road"]
+
+
+@pytest.mark.parametrize(
+    "line,expected",
+    [
+        ("Church Lane", "Church Lane"),
+        ("Chruch Lane", "Church Lane"),
+        ("Hgh Street", "High Street"),
+        ("Marlborugh Gardns", "Marlborough Gardens"),
+        ("12 High Street", None),
+        ("Station Approach", None),
+        ("London", None),
+        ("", None),
+    ],
+)
+def test_match_close_road(line: str, expected: Optional[str]):
+    match = _match_close_road(
+        line, line.lower(), ROADS, set(ROADS), _index_road_words(ROADS)
+    )
+
+    assert match == expected
+
+
+@pytest.mark.parametrize(
+    "lines,expected",
+    [
+        (("rose cottage", "off mill view", "", ""), "Mill View"),
+        (("1 church lane", "mill view", "", ""), "Church Lane"),
+        (("rose cottage", "village", "", ""), None),
+    ],
+)
+def test_match_found_road(lines: Tuple[str, ...], expected: Optional[str]):
+    automaton = ahocorasick.Automaton()
+    for road_name in ["Mill View", "Church Lane"]:
+        automaton.add_word(road_name.lower(), road_name)
+    automaton.make_automaton()
+
+    assert _match_found_road(automaton, lines) == expected
+
+
+@pytest.mark.parametrize(
+    "lines,expected",
+    [
+        (("12 High Street", "", "", ""), "High Street"),
+        (("Flat 3", "4a Unknown Road", "", ""), "Unknown Road"),
+        (("12-14 Mill View", "", "", ""), "Mill View"),
+        (("1 Acme Ltd", "2 Mill View", "", ""), "Mill View"),
+        (("Rose Cottage", "Village", "", ""), None),
+    ],
+)
+def test_match_after_house_number(lines: Tuple[str, ...], expected: Optional[str]):
+    assert _match_after_house_number(lines) == expected
+
+
+@pytest.mark.parametrize(
+    "lines,expected",
+    [
+        (("Rose Cottage", "Village", "", ""), "Village"),
+        (("Rose Cottage", "Village", "Acme Ltd", ""), "Village"),
+        (("PO Box 12", "", "", ""), None),
+        (("", "", "", ""), None),
+    ],
+)
+def test_match_last_line(lines: Tuple[str, ...], expected: Optional[str]):
+    assert _match_last_line(lines) == expected
+
+
+@pytest.mark.parametrize(
+    "lines,thoroughfare_or_desc,house_num_or_name,expected",
+    [
+        # Known road on its own line
+        (("Flat 3", "Church Lane", "", ""), "", "", ("Church Lane", "Flat 3")),
+        # Typo in a word shared with a known road
+        (("Flat 3", "Chruch Lane", "", ""), "", "", ("Church Lane", "Flat 3")),
+        # Typo in every word, so no known road shares a word with the line
+        (
+            ("Flat 3", "Marlborugh Gardns", "", ""),
+            "",
+            "",
+            ("Marlborough Gardens", "Flat 3"),
+        ),
+        # Road after a house number
+        (("12 High Street", "", "", ""), "", "", ("High Street", "12")),
+        (("4a Unknown Road", "Town", "", ""), "", "", ("Unknown Road", "4a")),
+        # Falls back to the last line that isn't empty
+        (
+            ("The Cottage", "Little Snoring", "", ""),
+            "",
+            "",
+            ("Little Snoring", "The Cottage"),
+        ),
+        # Nothing to match the road with
+        (("Acme Ltd", "", "", ""), "", "", ("", "Acme Ltd")),
+        # Already cleaned up, so nothing to update
+        (("12 High Street", "", "", ""), "High Street", "12", None),
+    ],
+)
+def test_cleanup_addresses(
+    lines: Tuple[str, str, str, str],
+    thoroughfare_or_desc: str,
+    house_num_or_name: str,
+    expected: Optional[Tuple[str, str]],
+):
+    address = AddressRow("id", *lines, thoroughfare_or_desc, house_num_or_name)
+
+    updates = cleanup_addresses([address], ROADS)
+
+    if expected is None:
+        assert updates == []
+    else:
+        thoroughfare, house = expected
+        assert updates == [
+            {
+                ID_KEY: "id",
+                THOROUGHFARE_KEY: thoroughfare,
+                HOUSE_NUM_OR_NAME_KEY: house,
+            }
+        ]
+
+
+def test_cleanup_addresses_uses_roads_found_in_other_addresses():
+    addresses = [
+        AddressRow("a", "1 Mill View", "", "", "", "Mill View", "1"),
+        AddressRow("b", "Rose Cottage", "Off Mill View", "Village", "", "", ""),
+    ]
+
+    updates = cleanup_addresses(addresses, ROADS)
+
+    assert updates == [
+        {
+            ID_KEY: "b",
+            THOROUGHFARE_KEY: "Mill View",
+            HOUSE_NUM_OR_NAME_KEY: "Rose Cottage",
+        }
+    ]
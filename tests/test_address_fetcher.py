@@ -1,13 +1,14 @@
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 import pytest
 from sqlalchemy.orm import Session
 
+from ukconstituencystreetbystreet import address_fetcher, config
 from ukconstituencystreetbystreet.address_fetcher import AddrFetcher
 from ukconstituencystreetbystreet.db import db_repr_sqlite as db_repr
 
-from conftest import TEST_CACHE_DB_FILE, get_test_engine
+from conftest import get_test_engine
 
 
 @pytest.fixture(scope="function")
@@ -22,52 +23,198 @@ def clear_api_req_table():
     delete()
 
 
+FAKE_DATETIME_NOW = datetime(year=2000, month=11, day=1, hour=15, minute=17)
+
+
+class FakeClock:
+    """Stands in for time.monotonic so the sliding window can be moved by hand"""
+
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(scope="function")
+def fake_clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(address_fetcher.time, "monotonic", clock)
+    monkeypatch.setattr(
+        AddrFetcher, "_get_floored_minute_now", lambda self: FAKE_DATETIME_NOW
+    )
+    return clock
+
+
+@pytest.fixture(scope="function")
+def make_addr_fetcher(monkeypatch, fake_clock, clear_api_req_table):
+    """Returns a function creating an AddrFetcher using the test database"""
+    monkeypatch.setattr(db_repr, "get_engine", get_test_engine)
+    monkeypatch.setattr(db_repr, "get_read_engine", get_test_engine)
+    return AddrFetcher
+
+
+def add_api_use(minute_by_minute_use: List[int]):
+    """Logs the given API use, one per minute going back from FAKE_DATETIME_NOW"""
+    with Session(get_test_engine()) as db_sess:
+        for minutes_ago, num_requests in enumerate(minute_by_minute_use):
+            db_sess.add(
+                db_repr.ApiUseLog(
+                    minute=FAKE_DATETIME_NOW - timedelta(minutes=minutes_ago),
+                    num_requests=num_requests,
+                )
+            )
+        db_sess.commit()
+
+
 @pytest.mark.parametrize(
-    "minute_by_minute_use,api_use_last_db_read_older",
+    "minute_by_minute_use,expected",
     [
-        (None, False),
-        (None, True),
-        ([0, 286, 12, 100, 1000, 300], False),
-        ([100, 286, 12, 100, 1000, 300], True),
-        ([100, 286, 2000, 100, 1000, 300], False),
-        ([100, 286, 2000, 100, 1000, 300], True),
+        ([], 0),
+        ([0, 286, 12, 100, 1000, 300], 1698),
+        ([100, 286, 2000, 100, 1000, 300, 7, 9], 3786),
     ],
 )
-def test_get_api_req_count_last_5_minutes(
-    clear_api_req_table,
-    minute_by_minute_use: Optional[List[int]],
-    api_use_last_db_read_older: bool,
+def test_api_window_loaded_from_db(
+    make_addr_fetcher, minute_by_minute_use: List[int], expected: int
 ):
-    fake_datetime_now = datetime(year=2000, month=11, day=1, hour=15, minute=17)
-    fake_count_this_min = 123
-
-    if minute_by_minute_use is not None:
-        # Fill in previous 6 minutes
-        count = -6
-        with Session(db_repr.get_engine()) as db_sess:
-            for x in minute_by_minute_use:
-                assert count < 0
-                db_sess.add(
-                    db_repr.ApiUseLog(
-                        minute=fake_datetime_now - timedelta(minutes=count),
-                        num_requests=x,
-                    )
-                )
-                count -= 1
-            db_sess.commit()
+    add_api_use(minute_by_minute_use)
+
+    addr_fetcher = make_addr_fetcher()
+
+    # Only the last 5 minutes, and the current one, are counted
+    assert addr_fetcher._get_api_req_count_last_5_minutes() == expected
+
+
+def test_api_window_evicts_old_minutes(make_addr_fetcher, fake_clock: FakeClock):
+    add_api_use([1, 10, 100, 1000, 10000, 100000])
+
+    addr_fetcher = make_addr_fetcher()
+    assert addr_fetcher._get_api_req_count_last_5_minutes() == 111111
+
+    fake_clock.now += 2 * 60
+    assert addr_fetcher._get_api_req_count_last_5_minutes() == 1111
+
+    addr_fetcher._add_api_req_count_this_minute()
+    assert addr_fetcher._get_api_req_count_last_5_minutes() == 1112
+
+    fake_clock.now += 4 * 60
+    assert addr_fetcher._get_api_req_count_last_5_minutes() == 1
+
+
+@pytest.mark.parametrize(
+    "headroom_offset,can_request",
+    [(-100, True), (-1, True), (0, False), (1, False)],
+)
+def test_can_req_based_on_api_count_boundary(
+    make_addr_fetcher, headroom_offset: int, can_request: bool
+):
+    max_requests_with_headroom = config.conf.scraping.max_requests_per_5_mins - 50
+    add_api_use([max_requests_with_headroom + headroom_offset])
+
+    addr_fetcher = make_addr_fetcher()
+
+    assert addr_fetcher._can_req_based_on_api_count() == can_request
+
+
+@pytest.mark.parametrize(
+    "latency_s,status_code,expected_limit",
+    [
+        (0.5, 200, 9),
+        (0.5, 404, 8),
+        (0.5, 429, 4),
+        (0.5, 500, 4),
+        (0.5, 503, 4),
+        (0.5, None, 4),
+        (3.0, 200, 4),
+    ],
+)
+def test_aimd_concurrency_limiter(
+    latency_s: float, status_code: Optional[int], expected_limit: int
+):
+    limiter = address_fetcher.AimdConcurrencyLimiter(
+        initial=8, minimum=1, maximum=20, target_latency_s=2.0
+    )
+
+    limiter.record_response(latency_s, status_code)
+
+    assert limiter.limit == expected_limit
+
+
+class FakeResponse:
+    """Stands in for a requests.Response with just a status code and headers"""
+
+    def __init__(self, headers: Dict[str, str], status_code: int = 429) -> None:
+        self.headers = headers
+        self.status_code = status_code
+
+
+@pytest.mark.parametrize(
+    "retry_after,expected",
+    [("0", 0.0), ("7", 7.0), ("2.5", 2.5), ("-3", 0.0)],
+)
+def test_get_rate_limit_wait_honours_retry_after(retry_after: str, expected: float):
+    response = FakeResponse({"Retry-After": retry_after})
+
+    assert address_fetcher.get_rate_limit_wait(response, attempt=3) == expected
+
+
+@pytest.mark.parametrize(
+    "retry_after", [None, "Wed, 21 Oct 2015 07:28:00 GMT"], ids=["none", "date"]
+)
+@pytest.mark.parametrize(
+    "attempt,cap",
+    [
+        (0, address_fetcher.RATE_LIMIT_BACKOFF_BASE_S),
+        (2, address_fetcher.RATE_LIMIT_BACKOFF_BASE_S * 4),
+        (5, address_fetcher.RATE_LIMIT_BACKOFF_MAX_S),
+        (10_000, address_fetcher.RATE_LIMIT_BACKOFF_MAX_S),
+    ],
+)
+def test_get_rate_limit_wait_backs_off_up_to_cap(
+    monkeypatch, retry_after: Optional[str], attempt: int, cap: float
+):
+    headers = {} if retry_after is None else {"Retry-After": retry_after}
+    # Always wait as long as allowed, so the cap itself is returned
+    monkeypatch.setattr(address_fetcher.random, "uniform", lambda low, high: high)
+
+    wait = address_fetcher.get_rate_limit_wait(FakeResponse(headers), attempt)
+
+    assert wait == cap
+
+
+@pytest.mark.parametrize(
+    "status_codes,expected_attempts",
+    [
+        ([200], 1),
+        ([404], 1),
+        ([429, 503, 200], 3),
+        (
+            [503] * address_fetcher.RATE_LIMIT_MAX_ATTEMPTS,
+            address_fetcher.RATE_LIMIT_MAX_ATTEMPTS,
+        ),
+    ],
+)
+def test_get_address_resp_for_postcode_wrapper_retries(
+    make_addr_fetcher, monkeypatch, status_codes: List[int], expected_attempts: int
+):
+    responses = iter(status_codes)
 
-    addr_fetcher = AddrFetcher()
-    addr_fetcher._get_floored_minute_now = lambda: fake_datetime_now
-    addr_fetcher._api_use_counter_this_min = fake_count_this_min
+    def get_address_resp_for_postcode(*args, **kwargs):
+        return FakeResponse({}, status_code=next(responses)), None
 
-    if api_use_last_db_read_older:
-        addr_fetcher._api_use_last_db_read = fake_datetime_now
-    else:
-        addr_fetcher._api_use_last_db_read = fake_datetime_now + timedelta(minutes=1)
+    monkeypatch.setattr(
+        address_fetcher,
+        "get_address_resp_for_postcode",
+        get_address_resp_for_postcode,
+    )
+    monkeypatch.setattr(address_fetcher.time, "sleep", lambda seconds: None)
 
-    returned = addr_fetcher._get_api_req_count_last_5_minutes()
+    addr_fetcher = make_addr_fetcher()
+    response, _ = addr_fetcher._get_address_resp_for_postcode_wrapper(
+        postcode="AB1 2CD", full_lookup=False
+    )
 
-    if minute_by_minute_use is None or api_use_last_db_read_older:
-        assert returned == fake_count_this_min
-    else:
-        assert returned == sum(minute_by_minute_use[-5:]) + fake_count_this_min
+    # Gives up with the last response, having counted every attempt
+    assert response.status_code == status_codes[expected_attempts - 1]
+    assert addr_fetcher._get_api_req_count_last_5_minutes() == expected_attempts
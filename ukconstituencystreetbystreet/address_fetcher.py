@@ -20,9 +20,9 @@ import random
 import re
 import threading
 import time
-from typing import Deque, Dict, List, Optional, Set, Tuple
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
 import logging
-from sqlalchemy import select, update, func
+from sqlalchemy import ColumnElement, insert, select, update
 import tqdm
 from urllib3.util.retry import Retry
 import concurrent.futures
@@ -31,7 +31,7 @@ import difflib
 import requests
 from requests.status_codes import codes
 import requests.adapters
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
 
 from ukconstituencystreetbystreet.db import db_repr_sqlite as db_repr
 from ukconstituencystreetbystreet import config
@@ -62,6 +62,18 @@ ALL_RESULTS = {
     "template": TEMPLATE,
 }
 
+# Span over which getaddress.io limits the number of API requests
+API_USE_WINDOW_S = 5 * 60
+
+# Bounds of the exponential backoff used when getaddress.io rate limits us
+RATE_LIMIT_BACKOFF_BASE_S = 10.0
+RATE_LIMIT_BACKOFF_MAX_S = 300.0
+# Doubling more than this many times would already exceed the maximum, and
+# clamping it stops huge attempt counts overflowing the float
+RATE_LIMIT_BACKOFF_MAX_EXPONENT = 5
+# How many times a rate limited or unavailable request is made before giving up
+RATE_LIMIT_MAX_ATTEMPTS = 5
+
 
 def get_retry_session(
     retries: int = 20,
@@ -86,6 +98,26 @@ def get_retry_session(
     return session
 
 
+def get_rate_limit_wait(response: requests.Response, attempt: int) -> float:
+    """
+    Returns how long to wait before retrying a rate limited request. Honours
+    the Retry-After header when given in seconds, otherwise backs off
+    exponentially with full jitter so that concurrent requests don't all
+    retry at the same moment.
+    """
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is not None:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            # Could be an HTTP date, just fall back to backing off
+            pass
+
+    exponent = min(attempt, RATE_LIMIT_BACKOFF_MAX_EXPONENT)
+    cap = min(RATE_LIMIT_BACKOFF_MAX_S, RATE_LIMIT_BACKOFF_BASE_S * 2**exponent)
+    return random.uniform(0, cap)
+
+
 def get_address_resp_for_postcode(
     postcode: str,
     full_lookup: bool,
@@ -117,19 +149,13 @@ def get_address_resp_for_postcode(
 
     headers = {"content-type": "application/json"}
 
-    current: float = 10
-    while True:
-        response = session.get(url=url, headers=headers)
+    response = session.get(url=url, headers=headers)
 
-        match response.status_code:
-            case 200:
-                return response, json.loads(response.text)
-            case 429:
-                time.sleep(current)
-                current *= 1.5
-                continue
-            case _:
-                return response, None
+    match response.status_code:
+        case 200:
+            return response, json.loads(response.text)
+        case _:
+            return response, None
 
 
 @dataclass
@@ -193,15 +219,17 @@ class NumAddressReqManager:
     def __init__(self) -> None:
         self.logger = logging.getLogger(self.__class__.__name__)
         self._lock = threading.Lock()
+        # Kept for the lifetime of the manager so usage checks reuse a connection
+        self._http_sess = get_retry_session()
 
         self._num_req_remaining = MAX_FULL_ADDRESS_LOOKUPS_PER_DAY
         self._last_date = datetime.now()
 
-        self._usages: UsageCounts = get_limit_for_day()
+        self._usages: UsageCounts = get_limit_for_day(self._http_sess)
         self.logger.info(f"Usages limits are: {self._usages}")
 
     def get_limits(self) -> UsageCounts:
-        return get_limit_for_day()
+        return get_limit_for_day(self._http_sess)
 
     def request_and_decrement(self) -> bool:
         with acquire_lock_timeout(self._lock, timeout=5) as locked:
@@ -209,7 +237,7 @@ class NumAddressReqManager:
                 # Check if we need to reset the number of lookups
                 time_now = datetime.now()
                 if self._last_date.date() != time_now.date():
-                    self._usages = get_limit_for_day()
+                    self._usages = get_limit_for_day(self._http_sess)
 
                 if self._usages.UsageToday < self._usages.DailyLimit:
                     self._usages.UsageToday += 1
@@ -225,26 +253,115 @@ class NumAddressReqManager:
                 raise TimeoutError("Failed to acquire lock within timeout")
 
 
+class AimdConcurrencyLimiter:
+    """
+    Limits how many requests are in flight at once, adjusting the limit with
+    AIMD: it grows by one after each quick successful response and halves after
+    a slow one, a rate limit, a server error or an exception.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        target_latency_s: float,
+    ) -> None:
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._condition = threading.Condition()
+
+        self._minimum = minimum
+        self._maximum = maximum
+        self._target_latency_s = target_latency_s
+
+        self._limit = max(minimum, min(maximum, initial))
+        self._in_flight = 0
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def __enter__(self) -> "AimdConcurrencyLimiter":
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight < self._limit)
+            self._in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def record_response(self, latency_s: float, status_code: Optional[int]) -> None:
+        """
+        Adjusts the limit given how long a request took and the status code it
+        returned, or None if it raised. Other client errors leave it unchanged.
+        """
+        with self._condition:
+            if (
+                status_code is None
+                or status_code == 429
+                or status_code >= 500
+                or latency_s > self._target_latency_s
+            ):
+                self._limit = max(self._minimum, self._limit // 2)
+                self.logger.debug(
+                    f"Slow or failed request ({status_code=}), "
+                    f"concurrency now {self._limit}"
+                )
+            elif 200 <= status_code < 300:
+                self._limit = min(self._maximum, self._limit + 1)
+            self._condition.notify_all()
+
+
 class AddrFetcher:
     """Fetches addresses from getaddress.io by constituency."""
 
     def __init__(self) -> None:
         self.engine = db_repr.get_engine()
+        self.read_engine = db_repr.get_read_engine()
 
         self.logger = logging.getLogger(self.__class__.__name__)
 
         self.num_req_manger = NumAddressReqManager()
 
         self.max_simultaneous_loops = 20
+        # How many of the max_simultaneous_loops are actually allowed to make
+        # requests at once, backing off when getaddress.io slows down
+        self._concurrency = AimdConcurrencyLimiter(
+            initial=4,
+            minimum=1,
+            maximum=self.max_simultaneous_loops,
+            target_latency_s=2.0,
+        )
         self.use_full_lookups = config.conf.scraping.allow_getting_full_address
 
+        # One HTTP session per fetching thread, so each keeps its connection to
+        # getaddress.io alive across postcodes rather than handshaking every time
+        self._http_local = threading.local()
+        # Likewise one database session per fetching thread for writing, reused
+        # across the postcodes it fetches rather than opening one per postcode
+        self._db_sessions = scoped_session(sessionmaker(self.engine))
+
         # Counts number of API requests this minute
         self._api_counter_lock = threading.Lock()
-        self._api_use_last_db_read: Optional[datetime] = None
-        self._db_count_last_5_mins: int = 0
         self._api_counter_current_time: Optional[datetime] = None
         self._api_use_counter_this_min: int = 0
 
+        # Sliding window of (time.monotonic(), num requests) made in the last
+        # 5 minutes, so checking the API limit never needs to touch the database
+        self._api_window: Deque[Tuple[float, int]] = deque()
+        self._api_window_count: int = 0
+        self._load_api_window_from_db()
+
+    def _get_http_session(self) -> requests.Session:
+        """Returns the HTTP session for the calling thread, creating it if needed"""
+        http_sess = getattr(self._http_local, "session", None)
+        if http_sess is None:
+            http_sess = get_retry_session(backoff_factor=10)
+            self._http_local.session = http_sess
+        return http_sess
+
     def _get_floored_minute_now(self) -> datetime:
         """
         Returns the current time floored to the minute
@@ -252,34 +369,40 @@ class AddrFetcher:
         """
         return datetime.now(timezone.utc).replace(second=0, microsecond=0)
 
+    def _load_api_window_from_db(self) -> None:
+        """
+        Seeds the sliding window with the API requests logged in the database
+        over the last 5 minutes, e.g. by a previous run. Each is treated as
+        made at the start of its minute, which only ever overestimates.
+        """
+        utc_now = self._get_floored_minute_now()
+        with Session(self.read_engine) as db_sess:
+            rows = db_sess.execute(
+                select(db_repr.ApiUseLog.minute, db_repr.ApiUseLog.num_requests)
+                .where(db_repr.ApiUseLog.minute >= (utc_now - timedelta(minutes=5)))
+                .order_by(db_repr.ApiUseLog.minute)
+            ).all()
+
+        monotonic_now = time.monotonic()
+        with self._api_counter_lock:
+            for minute, num_requests in rows:
+                age_s = (
+                    utc_now.replace(tzinfo=None) - minute.replace(tzinfo=None)
+                ).total_seconds()
+                self._api_window.append((monotonic_now - age_s, num_requests))
+                self._api_window_count += num_requests
+
     def _get_api_req_count_last_5_minutes(self) -> int:
         """Gets number of API requests made in the last 5 minutes"""
-        with Session(self.engine) as db_sess:
-            with self._api_counter_lock:
-                # Only get time after getting lock
-                utc_now = self._get_floored_minute_now()
-                self.logger.debug(
-                    f"{utc_now=}, {self._api_use_last_db_read=}, {self._db_count_last_5_mins=}, {self._api_use_counter_this_min}"
-                )
-
-                # If we have't read from the DB this minute, read the current count now
-                if self._api_use_last_db_read != utc_now:
-                    num_requests_last_5_minutes = (
-                        db_sess.query(func.sum(db_repr.ApiUseLog.num_requests))
-                        .where(
-                            db_repr.ApiUseLog.minute >= (utc_now - timedelta(minutes=5))
-                        )
-                        .scalar()
-                    )
-
-                    # May not have any rows in the last 5 minutes
-                    if num_requests_last_5_minutes is None:
-                        self._db_count_last_5_mins = 0
-                    else:
-                        self._db_count_last_5_mins = num_requests_last_5_minutes
+        with self._api_counter_lock:
+            # Drop requests that have fallen out of the window
+            window_start = time.monotonic() - API_USE_WINDOW_S
+            while len(self._api_window) > 0 and self._api_window[0][0] < window_start:
+                _, num_requests = self._api_window.popleft()
+                self._api_window_count -= num_requests
 
-                # Return current db count + not written to db since we're still in the same minute
-                return self._db_count_last_5_mins + self._api_use_counter_this_min
+            self.logger.debug(f"{self._api_window_count=}")
+            return self._api_window_count
 
     def _can_req_based_on_api_count(self) -> bool:
         """
@@ -296,41 +419,45 @@ class AddrFetcher:
         )
         if api_use_in_the_last_5_mins >= max_requests_with_headroom:
             # Update the counter in the database since we've run out of requests
-            self._update_api_counter_in_db()
+            with self._api_counter_lock:
+                self._update_api_counter_in_db()
             return False
         else:
             return True
 
     def _update_api_counter_in_db(self) -> None:
-        """Updates api use counter in the database with current counter and resets the counter"""
+        """
+        Updates api use counter in the database with current counter and resets
+        the counter. Must be called holding _api_counter_lock.
+        """
         if self._api_counter_current_time is None:
             return
 
-        with db_repr.DB_THREADING_LOCK:
-            utc_now = self._get_floored_minute_now()
-            with Session(self.engine) as db_sess:
-                latest = (
-                    db_sess.query(db_repr.ApiUseLog)
-                    .order_by(db_repr.ApiUseLog.minute.desc())
-                    .first()
-                )
+        utc_now = self._get_floored_minute_now()
+        with Session(self.engine) as db_sess:
+            db_sess.connection(execution_options=db_repr.WRITE_TRANSACTION_OPTIONS)
+            latest = (
+                db_sess.query(db_repr.ApiUseLog)
+                .order_by(db_repr.ApiUseLog.minute.desc())
+                .first()
+            )
 
-                # If an entry already exists then add counter
-                if latest is not None and utc_now == latest.minute:
-                    latest.num_requests += self._api_use_counter_this_min
-                else:
-                    db_sess.add(
-                        db_repr.ApiUseLog(
-                            minute=self._api_counter_current_time,
-                            num_requests=self._api_use_counter_this_min,
-                        )
+            # If an entry already exists then add counter
+            if latest is not None and utc_now == latest.minute:
+                latest.num_requests += self._api_use_counter_this_min
+            else:
+                db_sess.add(
+                    db_repr.ApiUseLog(
+                        minute=self._api_counter_current_time,
+                        num_requests=self._api_use_counter_this_min,
                     )
+                )
 
-                db_sess.commit()
+            db_sess.commit()
 
-                # Reset counter for this minute
-                self._api_use_counter_this_min = 0
-                self._api_counter_current_time = None
+            # Reset counter for this minute
+            self._api_use_counter_this_min = 0
+            self._api_counter_current_time = None
 
     def _add_api_req_count_this_minute(self) -> None:
         """
@@ -351,7 +478,26 @@ class AddrFetcher:
 
             self._api_use_counter_this_min += 1
 
+            self._api_window.append((time.monotonic(), 1))
+            self._api_window_count += 1
+
     def _get_address_resp_for_postcode_wrapper(self, *args, **kwargs):
+        """
+        Wraps get_address_resp_for_postcode, retrying rate limited or
+        unavailable requests up to RATE_LIMIT_MAX_ATTEMPTS times and returning
+        the last response if they never succeed. Every attempt is counted as API
+        use, and backing off doesn't hold on to a concurrency slot.
+        """
+        for attempt in range(RATE_LIMIT_MAX_ATTEMPTS):
+            if attempt > 0:
+                time.sleep(get_rate_limit_wait(result[0], attempt - 1))
+
+            result = self._get_address_resp_for_postcode_once(*args, **kwargs)
+            if result[0].status_code not in (429, 503):
+                break
+        return result
+
+    def _get_address_resp_for_postcode_once(self, *args, **kwargs):
         """Wraps get_address_resp_for_postcode by counting API use"""
         # Last case counter in case we wait more than 5 minutes
         counter = 5
@@ -375,28 +521,44 @@ class AddrFetcher:
             )
 
         self._add_api_req_count_this_minute()
-        return get_address_resp_for_postcode(*args, **kwargs)
+
+        with self._concurrency:
+            start = time.monotonic()
+            try:
+                result = get_address_resp_for_postcode(*args, **kwargs)
+            except Exception:
+                self._concurrency.record_response(time.monotonic() - start, None)
+                raise
+            self._concurrency.record_response(
+                time.monotonic() - start, result[0].status_code
+            )
+        return result
 
     def get_addresses_for_postcode(
         self,
         ons_postcode: db_repr.OnsPostcode,
         http_sess: Optional[requests.Session] = None,
+        fetched_postcodes: Optional[Set[str]] = None,
     ) -> Tuple[bool, bool]:
-        """Gets addresses for the given postcode"""
+        """
+        Gets addresses for the given postcode. If fetched_postcodes is given it
+        is trusted as the set of postcodes already fetched, rather than looking
+        the postcode up in the database.
+        """
         if http_sess is None:
-            http_sess = get_retry_session(backoff_factor=10)
+            http_sess = self._get_http_session()
 
         postcode = ons_postcode.postcode
-        address_deque: Deque[db_repr.SimpleAddress] = deque()
+        # Plain mappings rather than ORM objects, so they can be written with
+        # one executemany INSERT without any per-object unit of work tracking
+        address_rows: List[Dict[str, Any]] = []
 
-        with Session(self.engine) as db_sess:
-            fetched = (
-                db_sess.query(db_repr.PostcodeFetched)
-                .where(db_repr.PostcodeFetched.postcode == postcode)
-                .one_or_none()
+        if fetched_postcodes is None:
+            fetched_postcodes = self._get_fetched_postcodes(
+                db_repr.OnsPostcode.postcode == postcode
             )
 
-        if fetched is not None and fetched.was_fetched:
+        if postcode in fetched_postcodes:
             self.logger.info(f"Already fetched addresses {postcode=}")
             return 200, True
         self.logger.info(f"Fetching addresses for {postcode=}")
@@ -408,7 +570,7 @@ class AddrFetcher:
         match resp.status_code:
             case 200:
                 pass
-            case 429, 503:
+            case 429 | 503:
                 time.sleep(5)
                 return True, False
             case _:
@@ -440,7 +602,7 @@ class AddrFetcher:
                 match resp.status_code:
                     case 200:
                         pass
-                    case 429, 503:
+                    case 429 | 503:
                         time.sleep(5)
                         return True, False
                     case _:
@@ -460,43 +622,99 @@ class AddrFetcher:
                 get_address_io_id = item[GET_ADDRESS_IO_ID_KEY]
                 line_list = item[GET_ADDRESS_IO_ADDRESS_KEY].split("|")
 
-                address_deque.append(
-                    db_repr.SimpleAddress(
-                        postcode=postcode,
-                        line_1=line_list[0],
-                        line_2=line_list[1],
-                        line_3=line_list[2],
-                        line_4=line_list[3],
-                        house_num_or_name="",
-                        thoroughfare_or_desc="",
-                        town_or_city=line_list[4],
-                        locality=line_list[5],
-                        county=line_list[6],
-                        country=line_list[7],
-                        get_address_io_id=get_address_io_id,
-                    )
+                address_rows.append(
+                    {
+                        db_repr.SimpleAddressColumnNames.POSTCODE: postcode,
+                        db_repr.SimpleAddressColumnNames.LINE_1: line_list[0],
+                        db_repr.SimpleAddressColumnNames.LINE_2: line_list[1],
+                        db_repr.SimpleAddressColumnNames.LINE_3: line_list[2],
+                        db_repr.SimpleAddressColumnNames.LINE_4: line_list[3],
+                        db_repr.SimpleAddressColumnNames.HOUSE_NUM_OR_NAME: "",
+                        db_repr.SimpleAddressColumnNames.THOROUGHFARE_OR_DESC: "",
+                        db_repr.SimpleAddressColumnNames.TOWN_OR_CITY: line_list[4],
+                        db_repr.SimpleAddressColumnNames.LOCALITY: line_list[5],
+                        db_repr.SimpleAddressColumnNames.COUNTY: line_list[6],
+                        db_repr.SimpleAddressColumnNames.COUNTRY: line_list[7],
+                        db_repr.SimpleAddressColumnNames.GET_ADDRESS_IO_ID: get_address_io_id,
+                    }
                 )
 
         # Write to the database and commit
-        with Session(self.engine) as db_sess:
-            with db_repr.DB_THREADING_LOCK:
-                db_sess.add_all(address_deque)
-                db_sess.add(
-                    db_repr.PostcodeFetched(
-                        postcode=postcode,
-                        constituency_id=ons_postcode.constituency_id,
-                        was_fetched=True,
-                    )
+        db_sess = self._db_sessions()
+        try:
+            db_sess.connection(execution_options=db_repr.WRITE_TRANSACTION_OPTIONS)
+            if len(address_rows) > 0:
+                db_sess.execute(insert(db_repr.SimpleAddress), address_rows)
+            db_sess.add(
+                db_repr.PostcodeFetched(
+                    postcode=postcode,
+                    constituency_id=ons_postcode.constituency_id,
+                    was_fetched=True,
+                )
+            )
+            db_sess.commit()
+        except Exception:
+            # Leave the thread's session usable for the next postcode
+            db_sess.rollback()
+            raise
+        return True, True
+
+    def _get_fetched_postcodes(self, *criteria: ColumnElement[bool]) -> Set[str]:
+        """
+        Returns which postcodes matching the given criteria on OnsPostcode have
+        had addresses fetched. Filtering by the area in the database, rather
+        than binding every postcode in the area, keeps the query small.
+        """
+        with Session(self.read_engine) as db_sess:
+            return set(
+                db_sess.scalars(
+                    select(db_repr.PostcodeFetched.postcode)
+                    .join(db_repr.OnsPostcode)
+                    .where(*criteria)
+                    .where(db_repr.PostcodeFetched.was_fetched)
                 )
-                db_sess.commit()
-                return True, True
+            )
+
+    def _fetch_for_postcodes(
+        self,
+        ons_postcodes: List[db_repr.OnsPostcode],
+        area_criteria: ColumnElement[bool],
+        desc: str,
+    ) -> None:
+        """
+        Fetches addresses for each of the given postcodes, which are those in
+        OnsPostcode matching area_criteria, with up to max_simultaneous_loops
+        requests in flight at once since each one spends nearly all of its time
+        waiting on getaddress.io.
+        """
+        process = tqdm.tqdm(total=len(ons_postcodes), desc=desc)
+
+        # Check which postcodes are already done in one query up front
+        fetched_postcodes = self._get_fetched_postcodes(area_criteria)
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_simultaneous_loops
+        ) as executor:
+            futures = [
+                executor.submit(
+                    self.get_addresses_for_postcode,
+                    ons_postcode,
+                    fetched_postcodes=fetched_postcodes,
+                )
+                for ons_postcode in ons_postcodes
+            ]
+
+            for future in concurrent.futures.as_completed(futures):
+                # Re-raise anything that went wrong fetching a postcode
+                future.result()
+                process.update(1)
 
     def fetch_for_local_authority(self, name: str):
         """
         Fetch all addresses for the given local authority by downloading
         all addresses in a given postcode that are in the given constituency
         """
-        with Session(self.engine) as session:
+        with Session(self.read_engine) as session:
             results = (
                 session.query(db_repr.OnsPostcode)
                 .join(db_repr.OnsLocalAuthorityDistrict)
@@ -508,21 +726,19 @@ class AddrFetcher:
                     f"Need to have parsed ONS files to scrape data for {name}"
                 )
 
-            process = tqdm.tqdm(
-                total=len(results),
+            district_ids = {result.local_authority_district_id for result in results}
+            self._fetch_for_postcodes(
+                results,
+                db_repr.OnsPostcode.local_authority_district_id.in_(district_ids),
                 desc=f"Fetching addresses for postcodes in {name}",
             )
 
-            for postcode in results:
-                self.get_addresses_for_postcode(postcode)
-                process.update(1)
-
     def fetch_for_constituency(self, name: str):
         """
         Fetch all addresses for the given consistency by downloading
         all addresses in a given postcode that are in the given constituency
         """
-        with Session(self.engine) as session:
+        with Session(self.read_engine) as session:
             results = (
                 session.query(db_repr.OnsPostcode)
                 .join(db_repr.OnsConstituency)
@@ -532,26 +748,24 @@ class AddrFetcher:
             if len(results) == 0:
                 raise ReferenceError("Need to have parsed ONS files to scrape data")
 
-            process = tqdm.tqdm(
-                total=len(results),
+            constituency_ids = {result.constituency_id for result in results}
+            self._fetch_for_postcodes(
+                results,
+                db_repr.OnsPostcode.constituency_id.in_(constituency_ids),
                 desc=f"Fetching addresses for postcodes in {name}",
             )
 
-            for postcode in results:
-                self.get_addresses_for_postcode(postcode)
-                process.update(1)
-
     def fetch_constituencies(self, to_scrape: List[str]):
         """Fetch all addresses for each consituency specified"""
         self.logger.info(f"Scraping addresses for {to_scrape}")
 
-        with Session(self.engine) as session:
+        with Session(self.read_engine) as session:
             start_num_addresses = session.query(db_repr.SimpleAddress).count()
 
         for constituency_name in to_scrape:
             self.fetch_for_constituency(constituency_name)
 
-        with Session(self.engine) as session:
+        with Session(self.read_engine) as session:
             end_num_addresses = session.query(db_repr.SimpleAddress).count()
 
         new_addresses = end_num_addresses - start_num_addresses
@@ -561,13 +775,13 @@ class AddrFetcher:
         """Fetch all addresses for each local authority specified"""
         self.logger.info(f"Scraping addresses for {to_scrape}")
 
-        with Session(self.engine) as session:
+        with Session(self.read_engine) as session:
             start_num_addresses = session.query(db_repr.SimpleAddress).count()
 
         for constituency_name in to_scrape:
             self.fetch_for_local_authority(constituency_name)
 
-        with Session(self.engine) as session:
+        with Session(self.read_engine) as session:
             end_num_addresses = session.query(db_repr.SimpleAddress).count()
 
         new_addresses = end_num_addresses - start_num_addresses
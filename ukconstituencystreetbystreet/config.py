@@ -4,6 +4,7 @@ Module to allow configuration of this program
 
 import configparser
 import logging
+import os
 import pathlib
 from dataclasses import dataclass
 from typing import List
@@ -12,11 +13,65 @@ from typing import List
 MAIN_STORAGE_FOLDER = pathlib.Path("streetcheck_storage").absolute().resolve()
 CONFIG_FILE = MAIN_STORAGE_FOLDER / "config.ini"
 
+# Written to CONFIG_FILE when there isn't one yet
+DEFAULT_CONFIG = """\
+[INPUT]
+folder_for_data =
+ons_contituencies_csv = Westminster_Parliamentary_Constituencies_(December_2022)_Names_and_Codes_in_the_United_Kingdom.csv
+ons_postcodes_csv = NSPL21_FEB_2023_UK.csv
+os_openname_csv_folder = os_openname_csv_folder
+os_open_roads_geopackage = oproad_gb.gpkg
+ons_local_auth_csv = Local_Authority_Districts_December_2023_Boundaries_UK_BFE_6619220630419597412.csv
+ons_oa_csv = Output_Area_to_Lower_layer_Super_Output_Area_to_Middle_layer_Super_Output_Area_to_Local_Authority_District_(December_2021)_Lookup_in_England_and_Wales_v3.csv
+census_age_by_msoa_csv = Census Age Data by MSOA.csv
+census_age_by_oa_csv = census2021-ts007a-oa.csv
+ons_msoa_geojson = MSOA_2021_EW_BGC_V2_1370945015033551734.geojson
+ons_msoa_readble_names_csv = MSOA-Names-2.2.csv
+
+[OUTPUT]
+output_folder = Streetcheck Output
+use_subfolders = yes
+
+[SCRAPING]
+allow_getting_full_address = no
+get_address_io_api_key =
+get_address_io_admin_key =
+max_requests_per_5_mins = 2000
+
+[DATA_OPTS]
+constituencies =
+local_authorities =
+msoas =
+"""
+
 config_parser = configparser.ConfigParser()
+# Only bound once parse_config has run, see __getattr__
 conf: "RootConfigClass"
 
 
+def __getattr__(name: str):
+    """
+    Parses the config the first time conf is used if nothing has parsed it
+    yet, so importing this module doesn't read or create the config file.
+    MAIN_STORAGE_FOLDER and CONFIG_FILE are still resolved against the working
+    directory on import.
+    """
+    if name == "conf":
+        parse_config()
+        return conf
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Set once init_loggers has run, so calling it again doesn't open another log file
+_loggers_initialised = False
+
+
 def init_loggers():
+    global _loggers_initialised
+    if _loggers_initialised:
+        return
+    _loggers_initialised = True
+
     logging.basicConfig(
         level=logging.DEBUG,
         format="%(asctime)s [%(levelname)s] %(filename)s:"
@@ -32,7 +87,7 @@ def init_loggers():
         logger.setLevel(logging.WARNING)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class DataOptsConfig:
     """Data manipulation configuration"""
 
@@ -41,7 +96,7 @@ class DataOptsConfig:
     msoas: List[str]
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class InputConfig:
     """Input file locations configuration"""
 
@@ -58,7 +113,7 @@ class InputConfig:
     census_age_by_oa_csv: pathlib.Path
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class OutputConfig:
     """Output folder locations configuration"""
 
@@ -66,7 +121,7 @@ class OutputConfig:
     use_subfolders: bool
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class AddressDownloadConfig:
     """Config to download address data from getaddress.io"""
 
@@ -76,7 +131,7 @@ class AddressDownloadConfig:
     get_address_io_admin_key: str
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class RootConfigClass:
     """Root container for all config for easy of access to rest of the program"""
 
@@ -100,44 +155,10 @@ def parse_config():
 
         config_parser.read(CONFIG_FILE)
     else:
-        # Otherwise fill the config with defaults and write it to the default
-        # config location
-        config_parser["INPUT"] = {
-            "folder_for_data": "",
-            "ons_contituencies_csv": "Westminster_Parliamentary_Constituencies_"
-            "(December_2022)_Names_and_Codes"
-            "_in_the_United_Kingdom.csv",
-            "ons_postcodes_csv": "NSPL21_FEB_2023_UK.csv",
-            "os_openname_csv_folder": "os_openname_csv_folder",
-            "os_open_roads_geopackage": "oproad_gb.gpkg",
-            "ons_local_auth_csv": "Local_Authority_Districts_December_2023_Boundaries_UK_BFE_6619220630419597412.csv",
-            "ons_oa_csv": "Output_Area_to_Lower_layer_Super_Output_Area_to_Middle_layer_Super_Output_Area_to_Local_Authority_District_(December_2021)_Lookup_in_England_and_Wales_v3.csv",
-            "census_age_by_msoa_csv": "Census Age Data by MSOA.csv",
-            "census_age_by_oa_csv": "census2021-ts007a-oa.csv",
-            "ons_msoa_geojson": "MSOA_2021_EW_BGC_V2_1370945015033551734.geojson",
-            "ons_msoa_readble_names_csv": "MSOA-Names-2.2.csv",
-        }
-
-        config_parser["OUTPUT"] = {
-            "output_folder": "Streetcheck Output",
-            "use_subfolders": "yes",
-        }
-
-        config_parser["SCRAPING"] = {
-            "allow_getting_full_address": "no",
-            "get_address_io_api_key": "",
-            "get_address_io_admin_key": "",
-            "max_requests_per_5_mins": 2000,
-        }
-
-        config_parser["DATA_OPTS"] = {
-            "constituencies": "",
-            "local_authorities": "",
-            "msoas": "",
-        }
-
-        with open(CONFIG_FILE, "w") as configfile:
-            config_parser.write(configfile)
+        # Otherwise fill the config with defaults and write them to the default
+        # config location as they are, rather than formatting them back out
+        CONFIG_FILE.write_text(DEFAULT_CONFIG)
+        config_parser.read_string(DEFAULT_CONFIG)
 
     input_conf = config_parser["INPUT"]
     output_conf = config_parser["OUTPUT"]
@@ -147,40 +168,35 @@ def parse_config():
     # Convert if necessary to pathlip.Path
     folder_for_data_raw = input_conf["folder_for_data"]
     if folder_for_data_raw is None or len(folder_for_data_raw) == 0:
-        folder_for_data = pathlib.Path("").resolve()
+        # The working directory is already absolute and free of symlinks
+        folder_for_data = pathlib.Path(os.getcwd())
     else:
         folder_for_data = pathlib.Path(folder_for_data_raw).resolve()
 
+    def data_path(key: str) -> pathlib.Path:
+        """
+        Returns the configured data file under folder_for_data. That folder is
+        already resolved, so normalising the joined path is enough, without
+        resolving every file one path component at a time.
+        """
+        return pathlib.Path(os.path.normpath(folder_for_data / input_conf[key]))
+
     # Read all config and convert it to correct types for easy of use in the
     # rest of the program
     global conf
     conf = RootConfigClass(
         input=InputConfig(
             folder_for_data=folder_for_data,
-            ons_constituencies_csv=(
-                folder_for_data / input_conf["ons_contituencies_csv"]
-            ).resolve(),
-            ons_postcodes_csv=(
-                folder_for_data / input_conf["ons_postcodes_csv"]
-            ).resolve(),
+            ons_constituencies_csv=data_path("ons_contituencies_csv"),
+            ons_postcodes_csv=data_path("ons_postcodes_csv"),
             os_openname_csv_folder=pathlib.Path(input_conf["os_openname_csv_folder"]),
-            os_open_roads_geopackage=(
-                folder_for_data / input_conf["os_open_roads_geopackage"]
-            ).resolve(),
-            ons_local_auth_csv=(
-                folder_for_data / input_conf["ons_local_auth_csv"]
-            ).resolve(),
-            ons_oa_csv=(folder_for_data / input_conf["ons_oa_csv"]).resolve(),
-            ons_msoa_readble_names_csv=(folder_for_data / input_conf["ons_msoa_readble_names_csv"]).resolve(),
-            census_age_by_msoa_csv=(
-                folder_for_data / input_conf["census_age_by_msoa_csv"]
-            ).resolve(),
-            census_age_by_oa_csv=(
-                folder_for_data / input_conf["census_age_by_oa_csv"]
-            ).resolve(),
-            ons_msoa_geojson=(
-                folder_for_data / input_conf["ons_msoa_geojson"]
-            ).resolve(),
+            os_open_roads_geopackage=data_path("os_open_roads_geopackage"),
+            ons_local_auth_csv=data_path("ons_local_auth_csv"),
+            ons_oa_csv=data_path("ons_oa_csv"),
+            ons_msoa_readble_names_csv=data_path("ons_msoa_readble_names_csv"),
+            census_age_by_msoa_csv=data_path("census_age_by_msoa_csv"),
+            census_age_by_oa_csv=data_path("census_age_by_oa_csv"),
+            ons_msoa_geojson=data_path("ons_msoa_geojson"),
         ),
         output=OutputConfig(
             output_folder=pathlib.Path(output_conf["output_folder"]).resolve(),
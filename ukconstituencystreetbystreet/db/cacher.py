@@ -1,16 +1,20 @@
 import enum
+import hashlib
 import logging
-import os.path
 import pathlib
-from datetime import datetime
+import stat
+import threading
+from typing import Dict, Optional, Tuple
 
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from .db_repr_sqlite import (
-    Base,
     CsvFilesModified,
+    WRITE_TRANSACTION_OPTIONS,
+    ensure_schema,
     get_engine,
-    wrap_session,
 )
 
 
@@ -26,69 +30,164 @@ class DatafileName(enum.StrEnum):
     CensusAgeByOa = "census_age_by_oa_csv"
 
 
+# How much of the start and end of a file is hashed to fingerprint it
+FINGERPRINT_SAMPLE_SIZE = 1 << 20
+
+
+def file_stat(file: pathlib.Path) -> Tuple[float, int]:
+    """
+    Returns the modified time (in seconds since the epoch) and size of a file.
+    For a folder of files, the total size of all files in it is returned.
+    """
+    # One stat call per path, whose mode tells us whether it is a folder
+    st = file.stat()
+    if not stat.S_ISDIR(st.st_mode):
+        return st.st_mtime, st.st_size
+
+    size = 0
+    for child in file.rglob("*"):
+        child_st = child.stat()
+        if stat.S_ISREG(child_st.st_mode):
+            size += child_st.st_size
+    return st.st_mtime, size
+
+
+def file_fingerprint(file: pathlib.Path, size: Optional[int] = None) -> str:
+    """
+    Returns a hash identifying the contents of a file, from its size and its
+    first and last megabyte, which is enough to notice a new release of a data
+    file without reading all of it. For a folder of files, the name and size of
+    each file in it are hashed instead. The size of a file can be given if it is
+    already known, to save statting it again.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+
+    if file.is_dir():
+        for child in sorted(file.rglob("*")):
+            child_st = child.stat()
+            if stat.S_ISREG(child_st.st_mode):
+                relative_path = child.relative_to(file)
+                digest.update(f"{relative_path}:{child_st.st_size}\n".encode())
+        return digest.hexdigest()
+
+    if size is None:
+        size = file.stat().st_size
+    digest.update(str(size).encode())
+    with open(file, "rb") as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_SIZE))
+        if size > FINGERPRINT_SAMPLE_SIZE:
+            f.seek(max(size - FINGERPRINT_SAMPLE_SIZE, FINGERPRINT_SAMPLE_SIZE))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
 class DbCache:
     """Stores how recently the CSV in the database has been modified"""
 
     def __init__(self) -> None:
         self.engine = get_engine()
+        # One session reused by every call, the lock stops threads sharing it
         self.session = Session(self.engine)
+        self._lock = threading.Lock()
         self.logger = logging.getLogger(self.__class__.__name__)
 
         self.logger.debug("Created class")
 
-        Base.metadata.create_all(bind=self.engine)
+        ensure_schema(self.engine)
 
-    @wrap_session
-    def check_file_modified(self, file_id: DatafileName, file: pathlib.Path) -> bool:
+        # The table is tiny and only changes through this class, so keep a copy
+        # of it to check files against without querying the database each time
+        with Session(self.engine) as session:
+            self._files_modified: Dict[str, CsvFilesModified] = {
+                row.name: row for row in session.scalars(select(CsvFilesModified))
+            }
+
+    def check_file_modified(
+        self,
+        file_id: DatafileName,
+        file: pathlib.Path,
+        file_stats: Optional[Tuple[float, int]] = None,
+    ) -> bool:
         self.logger.debug("Checking file modified time of file_id")
-        row = self.session.get(CsvFilesModified, file_id.value)
-        modified_time = datetime.fromtimestamp(os.path.getmtime(file))
+        row = self._files_modified.get(file_id)
 
         if row is None:
             self.logger.debug(f"No row found for {file_id=} {file=}")
             return True
 
-        if row.filename != str(file) or row.modified != modified_time:
+        modified_time, size = file_stats or file_stat(file)
+        # Rows stored before sizes were recorded can only be checked by time
+        if row.filename != str(file) or row.size not in (None, size):
             self.logger.debug(f"File has been modified {file_id=} {file=}")
             return True
 
-        self.logger.debug(f"File has not been modified {file_id=} {file=}")
-        return False
-
-    def set_file_modified(self, file_id: DatafileName, file: pathlib.Path) -> None:
+        if row.modified == modified_time:
+            self.logger.debug(f"File has not been modified {file_id=} {file=}")
+            return False
+
+        # The file has been touched (e.g. downloaded again) but may not have
+        # changed, only hash it when we need to know
+        if row.fingerprint is not None and row.fingerprint == file_fingerprint(
+            file, size
+        ):
+            self.logger.debug(f"File contents have not changed {file_id=} {file=}")
+            return False
+
+        self.logger.debug(f"File has been modified {file_id=} {file=}")
+        return True
+
+    def set_file_modified(
+        self,
+        file_id: DatafileName,
+        file: pathlib.Path,
+        file_stats: Optional[Tuple[float, int]] = None,
+    ) -> None:
         self.logger.debug("Setting file modified time of file_id")
-        row = self.session.get(CsvFilesModified, file_id.value)
-        modified_time = datetime.fromtimestamp(os.path.getmtime(file))
-
-        if row is None:
-            self.session.add(
-                CsvFilesModified(
-                    name=file_id.value, filename=str(file), modified=modified_time
-                )
-            )
-        else:
-            row.filename = str(file)
-            row.modified = modified_time
-
-        self.session.flush()
-        self.session.commit()
+        modified_time, size = file_stats or file_stat(file)
+        fingerprint = file_fingerprint(file, size)
+
+        values = {
+            "name": file_id,
+            "filename": str(file),
+            "modified": modified_time,
+            "size": size,
+            "fingerprint": fingerprint,
+        }
+
+        # Insert or update the row in one statement, without reading it first
+        upsert = sqlite_insert(CsvFilesModified).values(**values)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[CsvFilesModified.name],
+            set_={key: upsert.excluded[key] for key in values if key != "name"},
+        )
+
+        with self._lock, self.session.begin():
+            self.session.connection(execution_options=WRITE_TRANSACTION_OPTIONS)
+            self.session.execute(upsert)
+
+        # Kept apart from the session so it never expires or needs refreshing
+        self._files_modified[file_id] = CsvFilesModified(**values)
 
     def check_and_set_file_modified(
         self, file_id: DatafileName, file: pathlib.Path
     ) -> bool:
-        check = self.check_file_modified(file_id, file)
-        self.set_file_modified(file_id, file)
+        # Stat the file once for both the check and the update
+        file_stats = file_stat(file)
+        check = self.check_file_modified(file_id, file, file_stats)
+        self.set_file_modified(file_id, file, file_stats)
         return check
 
-    @wrap_session
     def clear_file_modified(self, file_id: DatafileName):
-        self.session.query(CsvFilesModified).filter_by(name=file_id.value).delete()
-        self.session.commit()
+        with self._lock, self.session.begin():
+            self.session.connection(execution_options=WRITE_TRANSACTION_OPTIONS)
+            self.session.query(CsvFilesModified).filter_by(name=file_id).delete()
+        self._files_modified.pop(file_id, None)
 
-    @wrap_session
     def clear_all(self):
-        self.session.query(CsvFilesModified).delete()
-        self.session.commit()
+        with self._lock, self.session.begin():
+            self.session.connection(execution_options=WRITE_TRANSACTION_OPTIONS)
+            self.session.query(CsvFilesModified).delete()
+        self._files_modified.clear()
 
 
 DbCacheInst = DbCache()
@@ -1,61 +1,336 @@
 import enum
-import logging
+import functools
+import itertools
 from datetime import datetime
 import pathlib
-import threading
-from typing import Any, Dict, List, Optional, Protocol
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
-from sqlalchemy import Engine, Float, ForeignKey, Integer, String, create_engine
+import pandas as pd
+from sqlalchemy import (
+    Connection,
+    Engine,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    Select,
+    String,
+    create_engine,
+    event,
+    inspect,
+)
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
-    Session,
     exc,
     mapped_column,
     relationship,
 )
-from sqlalchemy.ext.declarative import declarative_base
 
 from ukconstituencystreetbystreet import config
+from ukconstituencystreetbystreet.db import sql_profiler
 
 CACHE_DB_FILE = config.MAIN_STORAGE_FOLDER / "local_cache.sqlite"
 
 
+# Applied to every connection the engine opens. page_size only takes effect
+# when the database is created, so has to come before switching it to WAL,
+# and has no effect on an existing database. WAL lets readers carry on while
+# another connection writes, and makes NORMAL synchronous safe against
+# corruption. cache_size is negative so it is in KiB, 256MiB here. A writer
+# waiting on another writer retries for busy_timeout ms rather than failing
+# with SQLITE_BUSY, and temporary tables and indexes are built in memory. Up
+# to the first 256MiB of the file is memory mapped, so reads of it are served
+# from the OS page cache without a copy into SQLite's own.
+CONNECTION_PRAGMAS = [
+    "PRAGMA page_size=8192",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-262144",
+    "PRAGMA mmap_size=268435456",
+]
+
+# Applied to connections of the read only engine. The journal mode can't be
+# changed from them and synchronous only matters to writers. There can be many
+# more of them, so each gets a smaller cache of 64MiB.
+READ_CONNECTION_PRAGMAS = [
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456",
+]
+
+# Number of connections the read only engine keeps open, enough for the
+# concurrent address fetcher's threads to read without waiting on each other
+READ_POOL_SIZE = 10
+
+
+# Execution options for a transaction that is going to write. Its BEGIN takes
+# SQLite's write lock straight away, so concurrent writers queue up behind
+# busy_timeout. Otherwise a transaction that read first can fail with
+# SQLITE_BUSY when it tries to write after another writer has committed.
+WRITE_TRANSACTION_OPTIONS = {"sqlite_begin_immediate": True}
+
+
+def _execute_pragmas(dbapi_connection, pragmas: List[str]) -> None:
+    cursor = dbapi_connection.cursor()
+    for pragma in pragmas:
+        cursor.execute(pragma)
+    cursor.close()
+
+    # Stop pysqlite emitting its own BEGIN, _begin_transaction does it instead
+    dbapi_connection.isolation_level = None
+
+
+def _set_connection_pragmas(dbapi_connection, connection_record) -> None:
+    _execute_pragmas(dbapi_connection, CONNECTION_PRAGMAS)
+
+
+def _set_read_connection_pragmas(dbapi_connection, connection_record) -> None:
+    _execute_pragmas(dbapi_connection, READ_CONNECTION_PRAGMAS)
+
+
+def _begin_transaction(conn: Connection) -> None:
+    if conn.get_execution_options().get("sqlite_begin_immediate", False):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    else:
+        conn.exec_driver_sql("BEGIN")
+
+
+@functools.lru_cache(maxsize=None)
 def get_engine(local_db_filename: pathlib.Path | str = CACHE_DB_FILE) -> Engine:
+    """
+    Returns the engine for the given database file. Engines are cached so that
+    every caller shares one connection pool per database, rather than each
+    building its own.
+    """
+    pathlib.Path(local_db_filename).parent.mkdir(parents=True, exist_ok=True)
+
     engine = create_engine(
         f"sqlite+pysqlite:///{str(local_db_filename)}",
     )
+    event.listen(engine, "connect", _set_connection_pragmas)
+    event.listen(engine, "begin", _begin_transaction)
+    if sql_profiler.profiling_enabled():
+        sql_profiler.attach(engine)
     return engine
 
 
-DB_THREADING_LOCK = threading.Lock()
-
-
-class Cacher(Protocol):
-    @property
-    def engine(self) -> Engine:
+@functools.lru_cache(maxsize=None)
+def get_read_engine(local_db_filename: pathlib.Path | str = CACHE_DB_FILE) -> Engine:
+    """
+    Returns a read only engine for the given database file, for queries that
+    never write. With WAL its connections neither wait on nor hold up writers
+    using get_engine, and it has a pool of its own so readers don't compete
+    with writers for connections.
+    """
+    # A read only connection can't create the database or switch it to WAL, so
+    # make sure a writable connection has done both first
+    with get_engine(local_db_filename).connect():
         pass
 
-    @property
-    def logger(self) -> logging.Logger:
-        pass
+    database_path = pathlib.Path(local_db_filename).resolve().as_posix()
 
-    @property
-    def session(self) -> Session:
-        pass
+    engine = create_engine(
+        f"sqlite+pysqlite:///file:{database_path}?mode=ro&uri=true",
+        pool_size=READ_POOL_SIZE,
+    )
+    event.listen(engine, "connect", _set_read_connection_pragmas)
+    event.listen(engine, "begin", _begin_transaction)
+    if sql_profiler.profiling_enabled():
+        sql_profiler.attach(engine)
+    return engine
 
 
-def wrap_session(func):
-    def magic(self: Cacher, *args, **kwargs):
-        self.session = Session(self.engine)
-        ret = func(self, *args, **kwargs)
-        self.session.close()
-        return ret
+# Number of rows pushed to SQLite per executemany call when bulk loading
+BULK_LOAD_BATCH_SIZE = 50_000
+
+# Only applied to the connection doing the bulk load, which is detached from
+# the pool and closed afterwards so these never leak into normal use
+BULK_LOAD_PRAGMAS = [
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA locking_mode=EXCLUSIVE",
+]
+
+
+def bulk_load_rows(
+    engine: Engine,
+    table_name: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    batch_size: int = BULK_LOAD_BATCH_SIZE,
+) -> int:
+    """
+    Appends all the given rows, which are ordered as in columns, to the given
+    table in a single transaction. Returns the number of rows written.
+
+    Rows are consumed lazily in batches, so a generator can stream rows into the
+    table without them all being held in memory.
+
+    For SQLite this bypasses SQLAlchemy and pushes rows in batches using
+    executemany on a raw connection. Other dialects go through a Core insert.
+    """
+    rows = iter(rows)
+    num_rows = 0
+
+    if engine.dialect.name != "sqlite":
+        table = Base.metadata.tables[table_name]
+        with engine.begin() as conn:
+            while batch := list(itertools.islice(rows, batch_size)):
+                conn.execute(table.insert(), [dict(zip(columns, x)) for x in batch])
+                num_rows += len(batch)
+        return num_rows
+
+    column_list = ",".join(columns)
+    placeholders = ",".join("?" * len(columns))
+    sql = f"INSERT INTO {table_name} ({column_list}) VALUES ({placeholders})"
+
+    indexes = Base.metadata.tables[table_name].indexes
+
+    conn = engine.raw_connection()
+    conn.detach()
+    try:
+        cursor = conn.cursor()
+        for pragma in BULK_LOAD_PRAGMAS:
+            cursor.execute(pragma)
+
+        cursor.execute("BEGIN")
+
+        # Loading into an empty table, build its indexes once all rows are in
+        # with one sort each, rather than updating them row by row. Both happen
+        # in the load's transaction, so the table is never left without them.
+        rebuild_indexes = (
+            cursor.execute(f"SELECT 1 FROM {table_name} LIMIT 1").fetchone() is None
+        )
+        if rebuild_indexes:
+            for index in indexes:
+                cursor.execute(f"DROP INDEX IF EXISTS {index.name}")
+
+        while batch := list(itertools.islice(rows, batch_size)):
+            cursor.executemany(sql, batch)
+            num_rows += len(batch)
+
+        if rebuild_indexes:
+            for index in indexes:
+                cursor.execute(str(CreateIndex(index).compile(dialect=engine.dialect)))
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return num_rows
+
+
+def _dataframe_rows(df: pd.DataFrame, batch_size: int) -> Iterator[Tuple[Any, ...]]:
+    for i in range(0, len(df.index), batch_size):
+        # Convert to python objects so sqlite3 can bind them, with NaN/NA
+        # becoming NULL like to_sql does
+        batch = df.iloc[i : i + batch_size].astype(object)
+        batch = batch.where(batch.notna(), None)
+        yield from batch.itertuples(index=False, name=None)
+
+
+def bulk_load_dataframes(
+    engine: Engine,
+    table_name: str,
+    dfs: Iterable[pd.DataFrame],
+    batch_size: int = BULK_LOAD_BATCH_SIZE,
+) -> int:
+    """
+    Appends all rows of each of the dataframes, which must share the same
+    columns, to the given table. Returns the number of rows written.
+
+    For SQLite this streams every dataframe through bulk_load_rows in a single
+    transaction, so the dataframes can be produced one at a time as they are
+    loaded. Other dialects fall back to a multi-row INSERT through to_sql.
+    """
+    dfs = iter(dfs)
+    first = next(dfs, None)
+    if first is None:
+        return 0
+    dfs = itertools.chain([first], dfs)
+
+    if engine.dialect.name != "sqlite":
+        num_rows = 0
+        for df in dfs:
+            df.to_sql(
+                table_name,
+                engine,
+                if_exists="append",
+                index=False,
+                chunksize=batch_size,
+                method="multi",
+            )
+            num_rows += len(df.index)
+        return num_rows
+
+    return bulk_load_rows(
+        engine,
+        table_name,
+        list(first.columns),
+        itertools.chain.from_iterable(_dataframe_rows(df, batch_size) for df in dfs),
+        batch_size,
+    )
 
-    return magic
+
+def bulk_load_dataframe(
+    engine: Engine,
+    table_name: str,
+    df: pd.DataFrame,
+    batch_size: int = BULK_LOAD_BATCH_SIZE,
+) -> int:
+    """
+    Appends all rows of the dataframe to the given table, see
+    bulk_load_dataframes.
+    """
+    return bulk_load_dataframes(engine, table_name, [df], batch_size)
+
+
+def read_sql_dataframe(engine: Engine, query: Select) -> pd.DataFrame:
+    """
+    Runs the query and returns its rows as a dataframe, with columns named
+    after the query's labels just like pd.read_sql.
+
+    For SQLite the rows are fetched straight from the sqlite3 cursor, skipping
+    SQLAlchemy's per-row result processing. That means values come back as
+    SQLite stores them, so this is only for queries of plain text and numbers.
+    """
+    if engine.dialect.name != "sqlite":
+        return pd.read_sql(query, engine)
+
+    compiled = query.compile(dialect=engine.dialect)
+    params = [compiled.params[name] for name in compiled.positiontup or []]
+
+    with engine.connect() as conn:
+        cursor = conn.connection.driver_connection.cursor()
+        try:
+            cursor.execute(str(compiled), params)
+            columns = [description[0] for description in cursor.description]
+            return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+        finally:
+            cursor.close()
 
 
 class Base(DeclarativeBase):
+    # Longer values are cut short in reprs, so logging many rows stays cheap
+    _repr_max_field_length = 40
+
     def _repr(self, **fields: Dict[str, Any]) -> str:
         """
         Helper for __repr__
@@ -64,7 +339,12 @@ class Base(DeclarativeBase):
         at_least_one_attached_attribute = False
         for key, field in fields.items():
             try:
-                field_strings.append(f"{key}={field!r}")
+                field_string = repr(field)
+                if len(field_string) > self._repr_max_field_length:
+                    field_string = (
+                        field_string[: self._repr_max_field_length - 3] + "..."
+                    )
+                field_strings.append(f"{key}={field_string}")
             except exc.DetachedInstanceError:
                 field_strings.append(f"{key}=DetachedInstanceError")
             else:
@@ -81,11 +361,23 @@ class CsvFilesModified(Base):
 
     name: Mapped[str] = mapped_column(primary_key=True)
     filename: Mapped[str]
-    modified: Mapped[datetime]
+    # Modified time as seconds since the epoch, exactly as os.stat gives it
+    modified: Mapped[float] = mapped_column(Float)
+    size: Mapped[Optional[int]]
+    fingerprint: Mapped[Optional[str]]
 
     def __repr__(self) -> str:
         return self._repr(
-            name=self.name, filename=self.filename, modified=self.modified
+            name=self.name,
+            filename=self.filename,
+            # Rows written before times were stored as numbers hold a string
+            modified=(
+                datetime.fromtimestamp(self.modified)
+                if isinstance(self.modified, (int, float))
+                else self.modified
+            ),
+            size=self.size,
+            fingerprint=self.fingerprint,
         )
 
 
@@ -114,12 +406,15 @@ class OnsConstituencyColumnsNames(enum.StrEnum):
 
 class OnsConstituency(Base):
     __tablename__ = "ons_constituency"
+    # Only ever looked up by its short code or by name, so store rows in the
+    # primary key's b-tree rather than beside it, like ons_postcode
+    __table_args__ = {"sqlite_with_rowid": False}
 
     oid: Mapped[str] = mapped_column(primary_key=True)
-    name: Mapped[str]
+    name: Mapped[str] = mapped_column(index=True)
 
     postcodes: Mapped[List["OnsPostcode"]] = relationship(
-        back_populates="constituency", lazy="select"
+        back_populates="constituency", lazy="raise"
     )
 
     def __repr__(self) -> str:
@@ -134,17 +429,19 @@ class OnsLocalAuthorityColumnsNames(enum.StrEnum):
 
 class OnsLocalAuthorityDistrict(Base):
     __tablename__ = "ons_local_auth_district"
+    # Keyed on a short code, so store rows in the primary key's b-tree
+    __table_args__ = {"sqlite_with_rowid": False}
 
     oid: Mapped[str] = mapped_column(primary_key=True)
-    name: Mapped[str]
+    name: Mapped[str] = mapped_column(index=True)
     ward_name: Mapped[str]
 
     postcodes: Mapped[List["OnsPostcode"]] = relationship(
-        back_populates="local_authority", lazy="select"
+        back_populates="local_authority", lazy="raise"
     )
 
     oas: Mapped[List["OnsOa"]] = relationship(
-        back_populates="local_authority_district", lazy="select"
+        back_populates="local_authority_district", lazy="raise"
     )
 
     def __repr__(self) -> str:
@@ -164,6 +461,8 @@ class OnsOaColumnsNames(enum.StrEnum):
 
 class OnsOa(Base):
     __tablename__ = "ons_oa"
+    # Keyed on a short code, so store rows in the primary key's b-tree
+    __table_args__ = {"sqlite_with_rowid": False}
 
     oid: Mapped[str] = mapped_column(primary_key=True)
     lsoa_id: Mapped[str]
@@ -173,13 +472,13 @@ class OnsOa(Base):
     )
 
     postcodes: Mapped[List["OnsPostcode"]] = relationship(
-        back_populates="oa", lazy="select"
+        back_populates="oa", lazy="raise"
     )
 
-    msoa: Mapped["OnsMsoa"] = relationship(back_populates="oas", lazy="select")
+    msoa: Mapped["OnsMsoa"] = relationship(back_populates="oas", lazy="raise")
 
     local_authority_district: Mapped["OnsLocalAuthorityDistrict"] = relationship(
-        back_populates="oas", lazy="select"
+        back_populates="oas", lazy="raise"
     )
 
     def __repr__(self) -> str:
@@ -210,13 +509,15 @@ class OnsMsoa(Base):
     readable_name: Mapped[str] = mapped_column(index=True)
     gb_os_easting: Mapped[int]
     gb_os_northing: Mapped[int]
-    geometry: Mapped[str]
+    # The MSOA's boundary as GeoJSON, which is large and only needed to draw
+    # maps, so it is only loaded when it is first accessed
+    geometry: Mapped[str] = mapped_column(deferred=True)
 
     postcodes: Mapped[List["OnsPostcode"]] = relationship(
-        back_populates="msoa", lazy="select"
+        back_populates="msoa", lazy="raise"
     )
 
-    oas: Mapped[List["OnsOa"]] = relationship(back_populates="msoa", lazy="select")
+    oas: Mapped[List["OnsOa"]] = relationship(back_populates="msoa", lazy="raise")
 
     def __repr__(self) -> str:
         return self._repr(
@@ -249,7 +550,7 @@ class CensusAgeByMsoa(Base):
     observed_count: Mapped[int]
     percent_of_msoa: Mapped[float]
 
-    msoa: Mapped["OnsMsoa"] = relationship()
+    msoa: Mapped["OnsMsoa"] = relationship(lazy="raise")
 
     def __repr__(self) -> str:
         return self._repr(
@@ -285,12 +586,26 @@ class OnsPostcodeColumnNames(enum.StrEnum):
 
 class OnsPostcode(Base):
     __tablename__ = "ons_postcode"
+    # Cluster rows on the postcode itself, so that joining on the postcode is a
+    # single b-tree search, and every secondary index also carries the postcode
+    __table_args__ = (
+        # Covers looking up a district's postcodes along with the constituency,
+        # MSOA and local authority each is in, without reading the table itself
+        Index(
+            "ix_postcode_district_covering",
+            "postcode_district",
+            "constituency_id",
+            "msoa_id",
+            "local_authority_district_id",
+        ),
+        {"sqlite_with_rowid": False},
+    )
 
     postcode: Mapped[str] = mapped_column(primary_key=True)
     postcode_outcode: Mapped[str] = mapped_column(index=True)
     postcode_incode: Mapped[str] = mapped_column(index=True)
     postcode_sector: Mapped[str] = mapped_column(index=True)
-    postcode_district: Mapped[str] = mapped_column(index=True)
+    postcode_district: Mapped[str]
     postcode_subdistrict: Mapped[Optional[str]] = mapped_column(index=True)
     postcode_area: Mapped[str] = mapped_column(index=True)
     country_id: Mapped[Optional[str]]
@@ -306,23 +621,23 @@ class OnsPostcode(Base):
     msoa_id: Mapped[str] = mapped_column(ForeignKey("ons_msoa.oid"), index=True)
 
     constituency: Mapped["OnsConstituency"] = relationship(
-        back_populates="postcodes", lazy="select"
+        back_populates="postcodes", lazy="raise"
     )
 
     local_authority: Mapped["OnsLocalAuthorityDistrict"] = relationship(
-        back_populates="postcodes", lazy="select"
+        back_populates="postcodes", lazy="raise"
     )
 
-    oa: Mapped["OnsOa"] = relationship(back_populates="postcodes", lazy="select")
+    oa: Mapped["OnsOa"] = relationship(back_populates="postcodes", lazy="raise")
 
-    msoa: Mapped["OnsMsoa"] = relationship(back_populates="postcodes", lazy="select")
+    msoa: Mapped["OnsMsoa"] = relationship(back_populates="postcodes", lazy="raise")
 
     addresses: Mapped[List["SimpleAddress"]] = relationship(
-        back_populates="ons_postcode", lazy="select"
+        back_populates="ons_postcode", lazy="raise"
     )
 
     roads: Mapped[List["OsOpennameRoad"]] = relationship(
-        back_populates="ons_postcodes", lazy="select"
+        back_populates="ons_postcodes", lazy="raise"
     )
 
     def __repr__(self) -> str:
@@ -330,7 +645,7 @@ class OnsPostcode(Base):
             postcode=self.postcode,
             country_id=self.country_id,
             region_id=self.region_id,
-            constituency=self.constituency,
+            constituency_id=self.constituency_id,
             electoral_ward_id=self.electoral_ward_id,
         )
 
@@ -353,7 +668,7 @@ class CensusAgeByOa(Base):
     total_15_to_34: Mapped[int]
     percentage_15_to_34: Mapped[float]
 
-    oa: Mapped["OnsOa"] = relationship()
+    oa: Mapped["OnsOa"] = relationship(lazy="raise")
 
     def __repr__(self) -> str:
         return self._repr(
@@ -382,12 +697,17 @@ class OsOpennameRoadColumnNames(enum.StrEnum):
 
 class OsOpennameRoad(Base):
     __tablename__ = "os_openname_road"
+    __table_args__ = (
+        # Covers looking up the names of the roads in postcode districts, which
+        # address cleanup does for every district, without reading the table
+        Index("ix_road_district_name", "postcode_district", "name"),
+    )
 
     os_id: Mapped[str] = mapped_column(primary_key=True)
     name: Mapped[str]
     local_type: Mapped[str]
     postcode_district: Mapped[str] = mapped_column(
-        ForeignKey("ons_postcode.postcode_district"), index=True
+        ForeignKey("ons_postcode.postcode_district")
     )
     populated_place: Mapped[Optional[str]]
     gb_os_easting: Mapped[int]
@@ -400,7 +720,7 @@ class OsOpennameRoad(Base):
     mbr_ymax: Mapped[int]
 
     ons_postcodes: Mapped[List[OnsPostcode]] = relationship(
-        back_populates="roads", lazy="select"
+        back_populates="roads", lazy="raise"
     )
 
     def __repr__(self) -> str:
@@ -430,6 +750,9 @@ class SimpleAddressColumnNames(enum.StrEnum):
 
 class SimpleAddress(Base):
     __tablename__ = "simple_addresses"
+    # Cleanup updates addresses by their id, a single b-tree search when rows
+    # are stored in the primary key's b-tree rather than beside it
+    __table_args__ = {"sqlite_with_rowid": False}
 
     get_address_io_id: Mapped[str] = mapped_column(primary_key=True)
     house_num_or_name: Mapped[Optional[str]]
@@ -445,7 +768,7 @@ class SimpleAddress(Base):
     postcode = mapped_column(ForeignKey("ons_postcode.postcode"), index=True)
 
     ons_postcode: Mapped[OnsPostcode] = relationship(
-        back_populates="addresses", lazy="select"
+        back_populates="addresses", lazy="raise"
     )
 
     def __repr__(self) -> str:
@@ -472,7 +795,8 @@ class PostcodeFetchedNames(enum.StrEnum):
 
 class PostcodeFetched(Base):
     __tablename__ = "postcode_fetched"
-    __table_args__ = {"sqlite_autoincrement": True}
+    # Keyed on the postcode, so store rows in the primary key's b-tree
+    __table_args__ = {"sqlite_with_rowid": False}
 
     postcode = mapped_column(
         ForeignKey("ons_postcode.postcode"),
@@ -483,3 +807,53 @@ class PostcodeFetched(Base):
 
     def __repr__(self) -> str:
         return self._repr(postcode=self.postcode, was_fetched=self.was_fetched)
+
+
+def create_missing_indexes(engine: Engine) -> None:
+    """
+    Creates any index declared on the models that doesn't exist yet.
+
+    create_all only creates indexes alongside tables it creates, so databases
+    made before an index was added to a model would never get it otherwise.
+    """
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
+def add_missing_columns(engine: Engine) -> None:
+    """
+    Adds any nullable column declared on the models that doesn't exist yet.
+
+    Like indexes, create_all won't add columns to a table that already exists.
+    Only nullable columns can be added this way, as existing rows have no value
+    for them.
+    """
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                )
+
+
+@functools.lru_cache(maxsize=None)
+def ensure_schema(engine: Engine) -> None:
+    """
+    Creates every table, column and index declared on the models that doesn't
+    exist yet. Only runs once per engine per process, however many times it is
+    called.
+    """
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    create_missing_indexes(engine)
@@ -0,0 +1,84 @@
+"""
+Optional profiling of the SQL run through the engines, to find slow queries
+and queries issued once per row (N+1s). Set UKCA_PROFILE_SQL=1 to enable it,
+and a summary of the queries that took longest in total, grouped by statement
+and the line of this package that ran them, is logged when the program exits.
+"""
+
+import atexit
+from collections import defaultdict
+import functools
+import logging
+import os
+import pathlib
+import sys
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Engine, event
+
+PROFILE_SQL_ENV_VAR = "UKCA_PROFILE_SQL"
+
+# Number of statements listed in the summary
+SUMMARY_LENGTH = 20
+
+PACKAGE_FOLDER = str(pathlib.Path(__file__).parent.parent)
+
+# Count and total duration of each statement, keyed by it and its call site
+_query_stats: Dict[Tuple[str, str], List[float]] = defaultdict(lambda: [0, 0.0])
+_query_stats_lock = threading.Lock()
+
+
+def profiling_enabled() -> bool:
+    return os.environ.get(PROFILE_SQL_ENV_VAR, "") == "1"
+
+
+def _call_site() -> str:
+    """Returns the innermost line of this package, outside this module, running"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PACKAGE_FOLDER) and filename != __file__:
+            return f"{filename[len(PACKAGE_FOLDER) + 1:]}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "<unknown>"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start_times"].pop()
+    key = (statement, _call_site())
+    with _query_stats_lock:
+        stats = _query_stats[key]
+        stats[0] += 1
+        stats[1] += duration
+
+
+def log_summary() -> None:
+    """Logs the statements that took the longest in total, with their counts"""
+    with _query_stats_lock:
+        slowest = sorted(
+            _query_stats.items(), key=lambda item: item[1][1], reverse=True
+        )[:SUMMARY_LENGTH]
+
+    logger = logging.getLogger("SqlProfiler")
+    for (statement, call_site), (count, total) in slowest:
+        logger.info(
+            f"{total:.3f}s over {count} executions at {call_site}: {statement}"
+        )
+
+
+@functools.cache
+def _register_summary() -> None:
+    atexit.register(log_summary)
+
+
+def attach(engine: Engine) -> None:
+    """Records every statement the engine runs, see the module docstring"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    _register_summary()
@@ -0,0 +1,371 @@
+from collections import defaultdict
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import ahocorasick
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from rapidfuzz import fuzz, process
+from sqlalchemy import Engine, Row, Select, select, update
+from sqlalchemy.orm import Session
+
+from ukconstituencystreetbystreet.db import db_repr_sqlite as db_repr
+
+
+# Groups are named so the same pattern can be handed to Arrow's extract_regex
+HOUSE_NUMBER_PATTERN = re.compile(
+    r"^(?P<house>\d+[a-zA-Z]{0,1}\s{0,1}[-/]{0,1}\s{0,1}\d*[a-zA-Z]{0,1})\s+(?P<street>.*)$"
+)
+# Searched for anywhere in a line, rather than matched with .* either side,
+# which made every check scan to the end of the line and backtrack
+LTD_PO_BOX_PATTERN = re.compile(r"ltd|po box|plc", re.IGNORECASE)
+
+PO_BOX_SUBSTRING = "po box"
+
+# Keys of the update mapping built for every changed address, as plain strings.
+# The enum members hash through a Python level method, the strings don't.
+ID_KEY = db_repr.SimpleAddressColumnNames.GET_ADDRESS_IO_ID.value
+THOROUGHFARE_KEY = db_repr.SimpleAddressColumnNames.THOROUGHFARE_OR_DESC.value
+HOUSE_NUM_OR_NAME_KEY = db_repr.SimpleAddressColumnNames.HOUSE_NUM_OR_NAME.value
+
+
+def select_addresses_for_cleanup() -> Select:
+    """
+    Selects just the columns of each address that cleanup needs, so that rows
+    can be matched without building an ORM object per address.
+    """
+    return select(
+        db_repr.SimpleAddress.get_address_io_id,
+        db_repr.SimpleAddress.line_1,
+        db_repr.SimpleAddress.line_2,
+        db_repr.SimpleAddress.line_3,
+        db_repr.SimpleAddress.line_4,
+        db_repr.SimpleAddress.thoroughfare_or_desc,
+        db_repr.SimpleAddress.house_num_or_name,
+    )
+
+
+def select_addresses_in_district_for_cleanup(postcode_district: str) -> Select:
+    """
+    Selects the columns cleanup needs of every address in a postcode district,
+    so a whole district is loaded with one query rather than one per postcode.
+    """
+    return (
+        select_addresses_for_cleanup()
+        .join(db_repr.OnsPostcode)
+        .where(db_repr.OnsPostcode.postcode_district == postcode_district)
+    )
+
+
+def _index_road_words(roads: Sequence[str]) -> Dict[str, List[int]]:
+    """
+    Maps each lowercased word of the given roads, as well as each road with its
+    spaces removed (to catch e.g. "Highstreet"), to the positions of the roads
+    """
+    roads_by_word: Dict[str, List[int]] = defaultdict(list)
+    for position, road in enumerate(roads):
+        words = road.lower().split()
+        for word in set(words) | {"".join(words)}:
+            roads_by_word[word].append(position)
+    return roads_by_word
+
+
+def _match_close_road(
+    line: str,
+    line_lower: str,
+    roads: Sequence[str],
+    roads_set: Set[str],
+    roads_by_word: Dict[str, List[int]],
+) -> Optional[str]:
+    """
+    Returns the road the line closely matches, if any. Only roads sharing a word
+    with the line are fuzzy matched, rather than every road in the district,
+    unless no road shares one, e.g. when every word of the road has a typo.
+    """
+    if line in roads_set:
+        return line
+
+    words = line_lower.split()
+    if len(words) == 0:
+        return None
+
+    positions: Set[int] = set()
+    for word in words:
+        positions.update(roads_by_word.get(word, ()))
+    positions.update(roads_by_word.get("".join(words), ()))
+
+    if len(positions) == 0:
+        candidates = roads
+    else:
+        # Keep the roads' order so ties resolve the same way as matching them all
+        candidates = [roads[position] for position in sorted(positions)]
+    close_match = process.extractOne(
+        line, candidates, scorer=fuzz.ratio, score_cutoff=90
+    )
+    if close_match is None:
+        return None
+    return close_match[0]
+
+
+def _match_found_road(
+    road_names_automaton: ahocorasick.Automaton, lines_lower: Sequence[str]
+) -> Optional[str]:
+    """Returns the first road name found in any of the lowercased lines"""
+    for each_line_lower in lines_lower:
+        for _, road_name in road_names_automaton.iter(each_line_lower):
+            return road_name
+    return None
+
+
+def _match_after_house_number(lines: Sequence[str]) -> Optional[str]:
+    """Returns what follows the house number of the first line starting with one"""
+    for each_line in lines:
+        # The pattern needs a leading digit, so don't run it on lines without one
+        if not each_line[:1].isdigit():
+            continue
+
+        house_match = HOUSE_NUMBER_PATTERN.match(each_line)
+
+        if house_match is not None:
+            street_group = house_match.group(2)
+
+            # Exclude po box or ltd
+            match = LTD_PO_BOX_PATTERN.search(street_group)
+
+            if street_group is not None and match is None:
+                return street_group.strip()
+    return None
+
+
+def _match_last_line(lines: Sequence[str]) -> Optional[str]:
+    """Returns the last line that isn't empty, a po box or a company"""
+    for line in reversed(lines):
+        if len(line) > 0:
+            match = LTD_PO_BOX_PATTERN.search(line)
+
+            if match is None:
+                return line
+    return None
+
+
+def cleanup_addresses(
+    addresses: Sequence[Row], roads: Iterable[str]
+) -> List[Dict[str, str]]:
+    """
+    Guesses the thoroughfare and house number or name of each of the given
+    address rows (as selected by select_addresses_for_cleanup), using the roads
+    we know of in the area to guess the street.
+
+    Returns a list of update mappings keyed by primary key, suitable for an
+    executemany UPDATE of SimpleAddress. Addresses that haven't changed are left
+    out, so that re-running cleanup writes nothing for them.
+    """
+    # Convert once so each fuzzy match iterates a plain tuple (a no-op when the
+    # caller already hands us one)
+    roads = tuple(roads)
+    roads_set = set(roads)
+    roads_by_word = _index_road_words(roads)
+
+    # Hold the addresses as parallel columns, indexed by position
+    ids = [address.get_address_io_id for address in addresses]
+    address_lines = [
+        (address.line_1, address.line_2, address.line_3, address.line_4)
+        for address in addresses
+    ]
+    thoroughfares = [address.thoroughfare_or_desc for address in addresses]
+    # Lowercase each line once up front, rather than every time it is compared
+    address_lines_lower = [
+        tuple(line.lower() for line in lines) for lines in address_lines
+    ]
+
+    # Run the checks that look at every address over whole columns at once in
+    # Arrow, rather than line by line through Python's re
+    line_columns = [
+        pa.array(column, type=pa.string()) for column in zip(*address_lines)
+    ]
+    is_po_box = list(
+        zip(
+            *(
+                pc.match_substring(
+                    column, PO_BOX_SUBSTRING, ignore_case=True
+                ).to_pylist()
+                for column in line_columns
+            )
+        )
+    )
+    house_matches = (
+        pc.extract_regex(line_columns[0], HOUSE_NUMBER_PATTERN.pattern).to_pylist()
+        if len(line_columns) > 0
+        else []
+    )
+
+    # Addresses the first pass couldn't find a thoroughfare for, which are the
+    # only ones the later matching needs to look at
+    unresolved = np.zeros(len(address_lines), dtype=np.bool_)
+    road_names_found: Set[str] = set()
+
+    # First pass using fuzzy matching against the known roads
+    for i, lines in enumerate(address_lines):
+        if len(thoroughfares[i]) > 0:
+            road_names_found.add(thoroughfares[i])
+            continue
+
+        found_thoroughfare = False
+
+        for j, each_line in enumerate(lines):
+            # First remove PO boxes, completely useless to us.
+            if is_po_box[i][j]:
+                # Mark it as found, its a po box so we don't care
+                found_thoroughfare = True
+                break
+
+            # If the road name closely matches any of the roads we know
+            match = _match_close_road(
+                each_line,
+                address_lines_lower[i][j],
+                roads,
+                roads_set,
+                roads_by_word,
+            )
+
+            if match is not None:
+                thoroughfares[i] = match
+                road_names_found.add(match)
+                found_thoroughfare = True
+
+        if not found_thoroughfare:
+            unresolved[i] = True
+
+    # Build an automaton over the road names found so far, so each line is
+    # scanned once for all of them rather than once per road name.
+    road_names_automaton = None
+    if len(road_names_found) > 0:
+        road_names_automaton = ahocorasick.Automaton()
+        for road_name in road_names_found:
+            road_names_automaton.add_word(road_name.lower(), road_name)
+        road_names_automaton.make_automaton()
+
+    # Resolve everything the first pass couldn't in one go per address, trying
+    # in order: a road name found in another address, whatever follows a house
+    # number, and finally the last line that isn't empty.
+    for i in np.flatnonzero(unresolved).tolist():
+        thoroughfare = None
+        if road_names_automaton is not None:
+            thoroughfare = _match_found_road(
+                road_names_automaton, address_lines_lower[i]
+            )
+        if thoroughfare is None:
+            thoroughfare = _match_after_house_number(address_lines[i])
+        if thoroughfare is None:
+            thoroughfare = _match_last_line(address_lines[i])
+
+        if thoroughfare is not None:
+            thoroughfares[i] = thoroughfare
+
+    # Finally, get house names or numbers using regex. If this fails just set
+    # the house number or name field to address line 1.
+    updates: List[Dict[str, str]] = []
+    # Most addresses share a handful of thoroughfares, so lowercase each once
+    thoroughfares_lower: Dict[str, str] = {}
+    for i, lines in enumerate(address_lines):
+        line_1 = lines[0]
+        house_num_or_name = line_1
+
+        thoroughfare_lower = thoroughfares_lower.get(thoroughfares[i])
+        if thoroughfare_lower is None:
+            thoroughfare_lower = thoroughfares[i].lower()
+            thoroughfares_lower[thoroughfares[i]] = thoroughfare_lower
+
+        if thoroughfare_lower in address_lines_lower[i][0]:
+            # Attempt to get house number or name
+            house_match = house_matches[i]
+
+            if house_match is not None:
+                house_num_or_name = house_match["house"]
+
+        if (
+            thoroughfares[i] == addresses[i].thoroughfare_or_desc
+            and house_num_or_name == addresses[i].house_num_or_name
+        ):
+            continue
+
+        updates.append(
+            {
+                ID_KEY: ids[i],
+                THOROUGHFARE_KEY: thoroughfares[i],
+                HOUSE_NUM_OR_NAME_KEY: house_num_or_name,
+            }
+        )
+
+    return updates
+
+
+def multiprocess_cleanup_init(e, read_e, roads: Dict[str, Sequence[str]]):
+    """
+    Pool initializer for cleanup_addresses_for_postcode_district, also handing
+    each worker the names of the roads in every postcode district so that
+    workers never need to query them.
+    """
+    global engine, read_engine, roads_by_district
+    engine = e
+    read_engine = read_e
+    roads_by_district = roads
+
+    engine.dispose(close=False)
+    read_engine.dispose(close=False)
+
+
+def cleanup_addresses_in_district(
+    engine: Engine,
+    read_engine: Engine,
+    postcode_district: str,
+    roads: Iterable[str],
+) -> None:
+    """
+    Performs parsing and clean up of 'thoroughfares' attribute of all addresses
+    in a given postcode district so that we can guess the house name or number,
+    as well as removing PO boxes and the like. If a street name isn't found then
+    don't mess with the address.
+
+    This is a pretty inefficient algorithm but since it is only used once per
+    constituency we can live with it for the sake of having a relatively simple
+    to understand method for clean up of address data.
+    """
+    with Session(read_engine) as session:
+        addresses = session.execute(
+            select_addresses_in_district_for_cleanup(postcode_district)
+        ).all()
+
+    updates = cleanup_addresses(addresses, roads)
+
+    # Workers queue on SQLite's write lock rather than a shared lock
+    if len(updates) > 0:
+        with Session(engine) as session:
+            session.connection(execution_options=db_repr.WRITE_TRANSACTION_OPTIONS)
+            session.execute(update(db_repr.SimpleAddress), updates)
+            session.commit()
+
+
+def cleanup_addresses_for_postcode_district(postcode_district: str) -> str:
+    """
+    Pool worker cleaning up the addresses of a postcode district, see
+    cleanup_addresses_in_district
+    """
+    global engine, read_engine, roads_by_district
+
+    try:
+        cleanup_addresses_in_district(
+            engine,
+            read_engine,
+            postcode_district,
+            roads_by_district.get(postcode_district, ()),
+        )
+    except Exception:
+        logging.getLogger(__name__).exception(
+            f"Cleanup failed for {postcode_district=}"
+        )
+        raise  # Re-raise the exception so that the process exits
+
+    return postcode_district
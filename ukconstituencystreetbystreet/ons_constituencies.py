@@ -4,12 +4,13 @@ Imports ONS constituency data and pushes it into the configured database.
 See https://geoportal.statistics.gov.uk/. This module parses Westminster Parliamentary Constituencies data from 2022
 """
 
+import csv
 import enum
 import logging
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional
 
-import pandas as pd
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, raiseload
 
 from ukconstituencystreetbystreet import config
 from ukconstituencystreetbystreet.db import cacher
@@ -50,33 +51,52 @@ class ConstituencyCsvParser:
 
         self.logger.info("Parsing ONS constituencies file")
 
-        rows = pd.read_csv(
-            self.csv,
-            header=0,
-            usecols=[0, 1],
-        )
-
-        rows.rename(
-            columns={
-                rows.columns[0]: db_repr.OnsConstituencyColumnsNames.OID,
-                rows.columns[1]: db_repr.OnsConstituencyColumnsNames.NAME,
-            },
-            inplace=True,
-        )
-        rows.to_sql(
-            db_repr.OnsConstituency.__tablename__,
+        # The file is small and only two columns are needed, so read it
+        # directly rather than going through pandas
+        with open(self.csv, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            next(reader)  # Skip the header
+            rows = [
+                (row[ConstituencyField.ID], row[ConstituencyField.NAME])
+                for row in reader
+            ]
+
+        db_repr.bulk_load_rows(
             self.engine,
-            if_exists="append",
-            index=False,
-            chunksize=100000,
+            db_repr.OnsConstituency.__tablename__,
+            [
+                db_repr.OnsConstituencyColumnsNames.OID,
+                db_repr.OnsConstituencyColumnsNames.NAME,
+            ],
+            rows,
         )
 
         cacher.DbCacheInst.set_file_modified(self.csv_name, self.csv)
 
         self.logger.info(
-            f"Finished parsing ONS constituencies file, wrote {len(rows.index)} items"
+            f"Finished parsing ONS constituencies file, wrote {len(rows)} items"
         )
 
+    def _cache_constituency(self, constituency: db_repr.OnsConstituency) -> None:
+        self.constituency_cache[constituency.oid] = constituency
+        self.constituency_by_name[constituency.name] = constituency
+
+    def prefetch_constituencies(self, names: Optional[Iterable[str]] = None) -> None:
+        """
+        Caches the constituencies with the given names, or every constituency if
+        no names are given, with a single query rather than one per lookup
+        """
+        query = select(db_repr.OnsConstituency).options(raiseload("*"))
+        if names is not None:
+            missing = [name for name in names if name not in self.constituency_by_name]
+            if len(missing) == 0:
+                return
+            query = query.where(db_repr.OnsConstituency.name.in_(missing))
+
+        with Session(self.engine) as session:
+            for constituency in session.scalars(query):
+                self._cache_constituency(constituency)
+
     def get_constituency(
         self, constituency_id: str
     ) -> Optional[db_repr.OnsConstituency]:
@@ -84,45 +104,42 @@ class ConstituencyCsvParser:
         Returns the constituency specified by the ID
         (which is defined by the ONS) if it exists
         """
-        session = Session(self.engine)
-        try:
-            if len(constituency_id) == 0:
-                raise ValueError("You must provide a string that isn't empty!")
-            elif constituency_id in self.constituency_cache:
-                return self.constituency_cache[constituency_id]
-            else:
-                returned = session.get(db_repr.OnsConstituency, constituency_id)
-                if returned is None:
-                    return None
-                else:
-                    self.constituency_cache[constituency_id] = returned
-                    return returned
-        finally:
-            session.close()
+        if len(constituency_id) == 0:
+            raise ValueError("You must provide a string that isn't empty!")
+
+        # Only open a session when the constituency hasn't been seen before
+        if constituency_id not in self.constituency_cache:
+            with Session(self.engine) as session:
+                returned = session.get(
+                    db_repr.OnsConstituency,
+                    constituency_id,
+                    options=[raiseload("*")],
+                )
+            if returned is None:
+                return None
+            self._cache_constituency(returned)
+
+        return self.constituency_cache[constituency_id]
 
     def get_constituency_by_name(
         self, constituency_name: str
     ) -> Optional[db_repr.OnsConstituency]:
         """Returns the constituency by name if it exists. Only performs exact matches."""
-        session = Session(self.engine)
-        try:
-            if len(constituency_name) == 0:
-                raise ValueError("You must provide a string that isn't empty!")
-            elif constituency_name in self.constituency_by_name:
-                return self.constituency_by_name[constituency_name]
-            else:
-                result = (
-                    session.query(db_repr.OnsConstituency)
-                    .filter(db_repr.OnsConstituency.name == constituency_name)
-                    .one()
-                )
-                if result is None:
-                    return None
-                else:
-                    self.constituency_by_name[constituency_name] = result
-                    return result
-        finally:
-            session.close()
+        if len(constituency_name) == 0:
+            raise ValueError("You must provide a string that isn't empty!")
+
+        if constituency_name not in self.constituency_by_name:
+            with Session(self.engine) as session:
+                result = session.execute(
+                    select(db_repr.OnsConstituency)
+                    .options(raiseload("*"))
+                    .where(db_repr.OnsConstituency.name == constituency_name)
+                ).scalar_one_or_none()
+            if result is None:
+                return None
+            self._cache_constituency(result)
+
+        return self.constituency_by_name[constituency_name]
 
     def clear_all(self):
         """Deletes all rows in the ONS constituencies table"""
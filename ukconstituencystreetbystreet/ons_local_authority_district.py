@@ -87,12 +87,8 @@ class LocalAuthorityCsvParser:
             inplace=True,
         )
 
-        rows.to_sql(
-            db_repr.OnsLocalAuthorityDistrict.__tablename__,
-            self.engine,
-            if_exists="append",
-            index=False,
-            chunksize=100000,
+        db_repr.bulk_load_dataframe(
+            self.engine, db_repr.OnsLocalAuthorityDistrict.__tablename__, rows
         )
 
         cacher.DbCacheInst.set_file_modified(self.csv_name, self.csv)
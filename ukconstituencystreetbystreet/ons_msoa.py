@@ -135,12 +135,8 @@ class OnsMsoaCsvParser:
         )
         rows.index.names = [db_repr.OnsMsoaColumnsNames.OID]
 
-        rows.to_sql(
-            db_repr.OnsMsoa.__tablename__,
-            self.engine,
-            if_exists="append",
-            index=True,
-            chunksize=100000,
+        db_repr.bulk_load_dataframe(
+            self.engine, db_repr.OnsMsoa.__tablename__, rows.reset_index()
         )
 
         cacher.DbCacheInst.set_file_modified(cacher.DatafileName.OnsMsoaGeoJson, self.geojson)
@@ -301,12 +297,8 @@ class CensusAgeByMsoaCsvParser:
             inplace=True,
         )
 
-        new_rows.to_sql(
-            db_repr.CensusAgeByMsoa.__tablename__,
-            self.engine,
-            if_exists="append",
-            index=False,
-            chunksize=100000,
+        db_repr.bulk_load_dataframe(
+            self.engine, db_repr.CensusAgeByMsoa.__tablename__, new_rows
         )
 
         cacher.DbCacheInst.set_file_modified(self.csv_name, self.csv)
@@ -90,13 +90,7 @@ class OnsOaCsvParser:
             inplace=True,
         )
 
-        rows.to_sql(
-            db_repr.OnsOa.__tablename__,
-            self.engine,
-            if_exists="append",
-            index=False,
-            chunksize=100000,
-        )
+        db_repr.bulk_load_dataframe(self.engine, db_repr.OnsOa.__tablename__, rows)
 
         cacher.DbCacheInst.set_file_modified(self.csv_name, self.csv)
 
@@ -221,12 +215,8 @@ class CensusAgeByOaCsvParser:
             inplace=True,
         )
 
-        rows.to_sql(
-            db_repr.CensusAgeByOa.__tablename__,
-            self.engine,
-            if_exists="append",
-            index=False,
-            chunksize=100000,
+        db_repr.bulk_load_dataframe(
+            self.engine, db_repr.CensusAgeByOa.__tablename__, rows
         )
 
         cacher.DbCacheInst.set_file_modified(self.csv_name, self.csv)
@@ -4,14 +4,18 @@ Imports ONS postcode data and pushes it into the configured database.
 See https://geoportal.statistics.gov.uk/. This module parses National Statistics Postcode Lookup (NSPL) - 2021 Census (February 2024) data.
 """
 
+from collections import deque
 import enum
 import logging
 import multiprocessing
+from multiprocessing.pool import AsyncResult
 import re
-from typing import Tuple
-import numpy as np
+from typing import Deque, Iterator, Tuple
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
@@ -21,7 +25,9 @@ from ukconstituencystreetbystreet.db import cacher
 from ukconstituencystreetbystreet.db import db_repr_sqlite as db_repr
 
 
-OUTCODE_REGEX = r"(?P<sub_district>(?P<district_1>(?P<area_1>[A-Z]{1,2})[0-9]{1})[A-Z]{1})|(?P<district_2>(?P<area_2>[A-Z]{1,2})[0-9]{1,2})|(?P<district_3>[A-Z]{3,4})"
+OUTCODE_REGEX = re.compile(
+    r"(?P<sub_district>(?P<district_1>(?P<area_1>[A-Z]{1,2})[0-9]{1})[A-Z]{1})|(?P<district_2>(?P<area_2>[A-Z]{1,2})[0-9]{1,2})|(?P<district_3>[A-Z]{3,4})"
+)
 
 
 def strip_spaces(x: str):
@@ -33,7 +39,7 @@ def split_postcode(outcode: str) -> Tuple[str, str, str]:
     Splits an outcode (for example, from AA9A 9AA, AA9A would be the outcode)
     into area, district and subdistrict
     """
-    match = re.search(OUTCODE_REGEX, outcode)
+    match = OUTCODE_REGEX.search(outcode)
     if match is None:
         raise ValueError(f"Couldn't find match in '{outcode}'!")
 
@@ -137,6 +143,23 @@ class OnsPostcodeField(enum.StrEnum):
     INTEGRATED_CARE_BOARD = "stp"
 
 
+# Columns of the NSPL CSV we keep, mapped to their column in the database
+CSV_FIELD_TO_COLUMN = {
+    OnsPostcodeField.POSTCODE: db_repr.OnsPostcodeColumnNames.POSTCODE,
+    OnsPostcodeField.COUNTRY: db_repr.OnsPostcodeColumnNames.COUNTRY_ID,
+    OnsPostcodeField.REGION: db_repr.OnsPostcodeColumnNames.REGION_ID,
+    OnsPostcodeField.WESTMINISTER_PARLIAMENTRY_CONSTITUENCY: db_repr.OnsPostcodeColumnNames.CONSTITUENCY_ID,  # noqa: E501
+    OnsPostcodeField.ELECTORAL_WARD: db_repr.OnsPostcodeColumnNames.ELECTORAL_WARD_ID,
+    OnsPostcodeField.LOCAL_AUTHORITY_DISTRICT: db_repr.OnsPostcodeColumnNames.LOCAL_AUTHORITY_DISTRICT_ID,
+    OnsPostcodeField.OUTPUT_AREA_CENSUS_21: db_repr.OnsPostcodeColumnNames.OA_ID,
+    OnsPostcodeField.ML_SUPER_OUTPUT_AREA_CENSUS_21: db_repr.OnsPostcodeColumnNames.MSOA_ID,
+}
+
+# Size of each block of the CSV streamed through arrow's parser, each of which
+# is broken down and loaded before later blocks need to be held in memory
+CSV_READ_BLOCK_SIZE = 16 << 20
+
+
 class PostcodeCsvParser:
     """Reads ONS Postcode CSV data into the database"""
 
@@ -164,69 +187,67 @@ class PostcodeCsvParser:
 
         self.logger.info("Parsing ONS postcodes file")
 
-        rows = pd.read_csv(
-            self.csv,
-            dtype={
-                OnsPostcodeField.POSTCODE_USER_TYPE: int,
-                OnsPostcodeField.NAT_GRID_REF_EAST: int,
-                OnsPostcodeField.NAT_GRID_REF_NORTH: int,
-                OnsPostcodeField.GRID_REF_POS_QUAL_IDX: int,
-                OnsPostcodeField.POSTCODE_USER_TYPE: int,
-                OnsPostcodeField.DECIMAL_DEGRESS_LAT: float,
-                OnsPostcodeField.DECIMAL_DEGRESS_LONG: float,
-                OnsPostcodeField.INDEX_OF_MULTIPLE_DEPRIVATION: float,
-            },
-            header=0,
-            converters={
-                OnsPostcodeField.POSTCODE: strip_spaces,
-            },
-            usecols=[
-                OnsPostcodeField.POSTCODE,
-                OnsPostcodeField.COUNTRY,
-                OnsPostcodeField.REGION,
-                OnsPostcodeField.WESTMINISTER_PARLIAMENTRY_CONSTITUENCY,
-                OnsPostcodeField.ELECTORAL_WARD,
-                OnsPostcodeField.LOCAL_AUTHORITY_DISTRICT,
-                OnsPostcodeField.OUTPUT_AREA_CENSUS_21,
-                OnsPostcodeField.ML_SUPER_OUTPUT_AREA_CENSUS_21,
-            ],
+        num_rows = db_repr.bulk_load_dataframes(
+            self.engine,
+            db_repr.OnsPostcode.__tablename__,
+            self._iter_broken_down_chunks(),
         )
 
-        rows.rename(
-            columns={
-                OnsPostcodeField.POSTCODE: db_repr.OnsPostcodeColumnNames.POSTCODE,
-                OnsPostcodeField.COUNTRY: db_repr.OnsPostcodeColumnNames.COUNTRY_ID,
-                OnsPostcodeField.REGION: db_repr.OnsPostcodeColumnNames.REGION_ID,
-                OnsPostcodeField.WESTMINISTER_PARLIAMENTRY_CONSTITUENCY: db_repr.OnsPostcodeColumnNames.CONSTITUENCY_ID,  # noqa: E501
-                OnsPostcodeField.ELECTORAL_WARD: db_repr.OnsPostcodeColumnNames.ELECTORAL_WARD_ID,
-                OnsPostcodeField.LOCAL_AUTHORITY_DISTRICT: db_repr.OnsPostcodeColumnNames.LOCAL_AUTHORITY_DISTRICT_ID,
-                OnsPostcodeField.OUTPUT_AREA_CENSUS_21: db_repr.OnsPostcodeColumnNames.OA_ID,
-                OnsPostcodeField.ML_SUPER_OUTPUT_AREA_CENSUS_21: db_repr.OnsPostcodeColumnNames.MSOA_ID,
-            },
-            inplace=True,
-        )
-        rows.dropna(
-            subset=[db_repr.OnsPostcodeColumnNames.CONSTITUENCY_ID], inplace=True
-        )
+        cacher.DbCacheInst.set_file_modified(self.csv_name, self.csv)
 
-        list_df = np.array_split(rows, multiprocessing.cpu_count())
-        with multiprocessing.Pool(multiprocessing.cpu_count()) as pool:
-            data = pool.map(breakdown_postcode, list_df)
-        final_rows = pd.concat(data)
+        self.logger.info(f"Finished parsing ONS postcodes file, wrote {num_rows} items")
 
-        final_rows.to_sql(
-            db_repr.OnsPostcode.__tablename__,
-            self.engine,
-            index=False,
-            if_exists="append",
-            chunksize=100000,
+    def _iter_chunks(self) -> Iterator[pd.DataFrame]:
+        """
+        Streams the CSV a block at a time, yielding the columns we keep from
+        each block with postcodes cleaned up and renamed to their database
+        columns.
+        """
+        reader = pv.open_csv(
+            self.csv,
+            read_options=pv.ReadOptions(block_size=CSV_READ_BLOCK_SIZE),
+            convert_options=pv.ConvertOptions(
+                include_columns=list(CSV_FIELD_TO_COLUMN),
+                column_types={field: pa.string() for field in CSV_FIELD_TO_COLUMN},
+                strings_can_be_null=True,
+            ),
         )
 
-        cacher.DbCacheInst.set_file_modified(self.csv_name, self.csv)
+        for batch in reader:
+            table = pa.Table.from_batches([batch])
 
-        self.logger.info(
-            f"Finished parsing ONS postcodes file, wrote {len(rows.index)} items"
-        )
+            # Strip spaces from postcodes in one vectorised pass rather than
+            # calling back into python for every row
+            postcode_idx = table.schema.get_field_index(OnsPostcodeField.POSTCODE)
+            table = table.set_column(
+                postcode_idx,
+                OnsPostcodeField.POSTCODE,
+                pc.replace_substring(table[OnsPostcodeField.POSTCODE], " ", ""),
+            )
+            table = table.rename_columns(
+                [CSV_FIELD_TO_COLUMN[name] for name in table.column_names]
+            )
+            table = table.filter(
+                pc.is_valid(table[db_repr.OnsPostcodeColumnNames.CONSTITUENCY_ID])
+            )
+            yield table.to_pandas()
+
+    def _iter_broken_down_chunks(self) -> Iterator[pd.DataFrame]:
+        """
+        Breaks down the postcodes of each chunk of the CSV across a pool of
+        processes, yielding chunks in order as they finish. Only a few chunks
+        are in flight at once so memory stays bounded however large the CSV is.
+        """
+        num_processes = multiprocessing.cpu_count()
+        with multiprocessing.Pool(num_processes) as pool:
+            pending: Deque[AsyncResult] = deque()
+            for chunk in self._iter_chunks():
+                pending.append(pool.apply_async(breakdown_postcode, (chunk,)))
+                if len(pending) >= 2 * num_processes:
+                    yield pending.popleft().get()
+
+            while len(pending) > 0:
+                yield pending.popleft().get()
 
     def add_postcode_district_to_add(self):
         rows = pd.read_sql_table(db_repr.OnsPostcode.__tablename__, self.engine)
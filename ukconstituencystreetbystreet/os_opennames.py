@@ -6,6 +6,7 @@ See https://osdatahub.os.uk/downloads/open/OpenNames, 'A comprehensive dataset o
 
 import enum
 import logging
+import multiprocessing
 import pathlib
 from typing import List
 
@@ -57,6 +58,36 @@ class OsOpennamesFields(enum.StrEnum):
     SAME_AS_GEONAMES = "SAME_AS_GEONAMES"
 
 
+def strip_spaces(x: str):
+    return x.replace(" ", "")
+
+
+def read_opennames_roads_csv(file: pathlib.Path) -> pd.DataFrame:
+    """Reads the roads out of one OS Open Names CSV"""
+    rows = pd.read_csv(
+        file,
+        header=0,
+        names=list(OsOpennamesFields),
+        converters={
+            OsOpennamesFields.POSTCODE_DISTRICT: strip_spaces,
+        },
+        usecols=[
+            OsOpennamesFields.ID,
+            OsOpennamesFields.NAME1,
+            OsOpennamesFields.LOCAL_TYPE,
+            OsOpennamesFields.POSTCODE_DISTRICT,
+            OsOpennamesFields.POPULATED_PLACE,
+            OsOpennamesFields.GB_OS_EASTING,
+            OsOpennamesFields.GB_OS_NORTHING,
+            OsOpennamesFields.MBR_XMIN,
+            OsOpennamesFields.MBR_XMAX,
+            OsOpennamesFields.MBR_YMIN,
+            OsOpennamesFields.MBR_YMAX,
+        ],
+    )
+    return rows[rows[OsOpennamesFields.LOCAL_TYPE].str.contains("Road")]
+
+
 class OsOpenNamesCsvsParser:
     """Reads OS Opennames CSV data into the database"""
 
@@ -89,38 +120,10 @@ class OsOpenNamesCsvsParser:
 
         self.logger.info("Parsing OS opennames files")
 
-        def strip_spaces(x: str):
-            return x.replace(" ", "")
-
-        all_csvs = []
-        for file in self.csv_files:
-            all_csvs.append(
-                pd.read_csv(
-                    file,
-                    header=0,
-                    names=list(OsOpennamesFields),
-                    converters={
-                        OsOpennamesFields.POSTCODE_DISTRICT: strip_spaces,
-                    },
-                    usecols=[
-                        OsOpennamesFields.ID,
-                        OsOpennamesFields.NAME1,
-                        OsOpennamesFields.LOCAL_TYPE,
-                        OsOpennamesFields.POSTCODE_DISTRICT,
-                        OsOpennamesFields.POPULATED_PLACE,
-                        OsOpennamesFields.GB_OS_EASTING,
-                        OsOpennamesFields.GB_OS_NORTHING,
-                        OsOpennamesFields.MBR_XMIN,
-                        OsOpennamesFields.MBR_XMAX,
-                        OsOpennamesFields.MBR_YMIN,
-                        OsOpennamesFields.MBR_YMAX,
-                    ],
-                )
-            )
-
-        rows = pd.concat(all_csvs)
-
-        rows = rows[rows[OsOpennamesFields.LOCAL_TYPE].str.contains("Road")]
+        # Each file is a tile of the country, parse them in parallel and only
+        # hand the roads back
+        with multiprocessing.Pool(multiprocessing.cpu_count()) as pool:
+            rows = pd.concat(pool.imap(read_opennames_roads_csv, self.csv_files))
 
         # Convert to integer types after we've removed everything that might not have area etc
         rows[OsOpennamesFields.GB_OS_EASTING] = rows[
@@ -159,12 +162,8 @@ class OsOpenNamesCsvsParser:
             inplace=True,
         )
 
-        rows.to_sql(
-            db_repr.OsOpennameRoad.__tablename__,
-            self.engine,
-            if_exists="append",
-            index=False,
-            chunksize=100000,
+        db_repr.bulk_load_dataframe(
+            self.engine, db_repr.OsOpennameRoad.__tablename__, rows
         )
 
         self.logger.info(
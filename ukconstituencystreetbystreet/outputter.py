@@ -1,17 +1,20 @@
 """"""
 import argparse
 import concurrent.futures
+import csv
 import json
 import logging
 import multiprocessing
+import os
 from multiprocessing.pool import AsyncResult
 import re
-from typing import List, Optional
+from typing import Callable, List, Optional
 import difflib
 import pathlib
 
 import pandas as pd
 import tqdm
+from sqlalchemy import LABEL_STYLE_TABLENAME_PLUS_COL, Select, select
 from sqlalchemy.orm import Session
 
 from ukconstituencystreetbystreet import (
@@ -122,6 +125,48 @@ class ConstituencyInfoOutputter:
         """Downloads all address data for the given local_authority names"""
         self.street_fetcher.fetch_local_authorities(constituency_names)
 
+    def _write_streets_csv(
+        self, query: Select, get_folder: Callable[[], pathlib.Path], name: str
+    ):
+        """
+        Streams the single street name column returned by the query straight
+        into a CSV, without building a DataFrame of the whole result. The CSV is
+        laid out as DataFrame.to_csv wrote it, with the index as an unnamed
+        first column. Doesn't create a CSV if there are no results.
+        """
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(query)
+
+            first_row = result.fetchone()
+            if first_row is None:
+                self.logger.debug(f"Found no addresses for {name}")
+                return
+
+            dir = get_folder()
+            with open(
+                dir / f"{name} Street Names.csv", "w", newline="", encoding="utf-8"
+            ) as f:
+                writer = csv.writer(f, lineterminator=os.linesep)
+                writer.writerow(["", *result.keys()])
+                writer.writerow([0, *first_row])
+                writer.writerows(
+                    [index, *row] for index, row in enumerate(result, start=1)
+                )
+
+    def _streets_query(self) -> Select:
+        """
+        Returns a query of the distinct named streets of all addresses. The
+        column label and row order are those of the ORM query street CSVs used
+        to be written from, so the CSVs come out the same.
+        """
+        return (
+            select(db_repr.SimpleAddress.thoroughfare_or_desc)
+            .set_label_style(LABEL_STYLE_TABLENAME_PLUS_COL)
+            .distinct()
+            .where(db_repr.SimpleAddress.thoroughfare_or_desc.is_not(None))
+            .where(db_repr.SimpleAddress.thoroughfare_or_desc != "")
+        )
+
     def make_csv_streets_in_constituency(
         self,
         name: Optional[str] = None,
@@ -129,33 +174,25 @@ class ConstituencyInfoOutputter:
     ):
         """Make CSV of all streets in a given constituency"""
         assert id is not None or name is not None
-        with Session(self.engine) as session:
-            if name is None:
-                name = self.constituency_parser.get_constituency(id).name
+        if name is None:
+            name = self.constituency_parser.get_constituency(id).name
 
-            base_query = (
-                session.query(db_repr.SimpleAddress)
-                .join(db_repr.OnsPostcode)
-                .join(db_repr.OnsConstituency)
-                .where(db_repr.SimpleAddress.thoroughfare_or_desc != None)
-                .where(db_repr.SimpleAddress.thoroughfare_or_desc != "")
-            )
-
-            if id is not None:
-                mid_query = base_query.filter(db_repr.OnsConstituency.oid == id)
-            else:
-                mid_query = base_query.filter(db_repr.OnsConstituency.name == name)
+        base_query = (
+            self._streets_query()
+            .join(db_repr.OnsPostcode)
+            .join(db_repr.OnsConstituency)
+        )
 
-            final_query = mid_query.distinct(
-                db_repr.SimpleAddress.thoroughfare_or_desc
-            ).with_entities(db_repr.SimpleAddress.thoroughfare_or_desc)
+        if id is not None:
+            final_query = base_query.where(db_repr.OnsConstituency.oid == id)
+        else:
+            final_query = base_query.where(db_repr.OnsConstituency.name == name)
 
-            df = pd.read_sql(final_query.selectable, self.engine)
-            if len(df.index) == 0:
-                self.logger.debug(f"Found no addresses for constituency {name}")
-            else:
-                dir = self.get_specific_constituency_folder(name)
-                df.to_csv(str(dir / f"{name} Street Names.csv"))
+        self._write_streets_csv(
+            final_query,
+            lambda: self.get_specific_constituency_folder(name),
+            name,
+        )
 
     def make_csv_addresses_in_constituency(
         self,
@@ -181,7 +218,7 @@ class ConstituencyInfoOutputter:
             else:
                 final_query = base_query.filter(db_repr.OnsConstituency.name == name)
 
-            df = pd.read_sql(final_query.selectable, self.engine)
+            df = db_repr.read_sql_dataframe(self.engine, final_query.selectable)
             if len(df.index) == 0:
                 self.logger.debug(f"Found no addresses for constituency {name}")
             else:
@@ -193,27 +230,26 @@ class ConstituencyInfoOutputter:
         For all constituencies in the database, make a CSV of
         addresses in each constituency
         """
-        with Session(self.engine) as session:
-            all_constituencies = [
-                constituency.oid
-                for constituency in session.query(db_repr.OnsConstituency).all()
-            ]
-
-            def make_csvs_for_constituency(constituency_id: str) -> bool:
-                self.make_csv_streets_in_constituency(id=constituency_id)
-                self.make_csv_addresses_in_constituency(id=constituency_id)
-
-            with concurrent.futures.ThreadPoolExecutor(
-                max_workers=multiprocessing.cpu_count()
-            ) as executor:
-                results = list(
-                    tqdm.tqdm(
-                        executor.map(make_csvs_for_constituency, all_constituencies),
-                        total=len(all_constituencies),
-                        desc="Outputting addresses to CSV",
-                    )
+        # Cache every constituency up front, so the threads below can look
+        # up each one's name without a query each
+        self.constituency_parser.prefetch_constituencies()
+        all_constituencies = list(self.constituency_parser.constituency_cache)
+
+        def make_csvs_for_constituency(constituency_id: str) -> bool:
+            self.make_csv_streets_in_constituency(id=constituency_id)
+            self.make_csv_addresses_in_constituency(id=constituency_id)
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=multiprocessing.cpu_count()
+        ) as executor:
+            results = list(
+                tqdm.tqdm(
+                    executor.map(make_csvs_for_constituency, all_constituencies),
+                    total=len(all_constituencies),
+                    desc="Outputting addresses to CSV",
                 )
-            return results
+            )
+        return results
 
     def get_similar_constituencies(self, search_term: str) -> List[str]:
         """Returns constituencies that match the name of the search term"""
@@ -285,37 +321,27 @@ class ConstituencyInfoOutputter:
     ):
         """Make CSV of all streets in a given local authority"""
         assert id is not None or name is not None
-        with Session(self.engine) as session:
-            if name is None:
-                name = self.local_authority_parser.get_local_authority(id).name
+        if name is None:
+            name = self.local_authority_parser.get_local_authority(id).name
 
-            base_query = (
-                session.query(db_repr.SimpleAddress)
-                .join(db_repr.OnsPostcode)
-                .join(db_repr.OnsLocalAuthorityDistrict)
-                .where(db_repr.SimpleAddress.thoroughfare_or_desc != None)
-                .where(db_repr.SimpleAddress.thoroughfare_or_desc != "")
-            )
-
-            if id is not None:
-                mid_query = base_query.filter(
-                    db_repr.OnsLocalAuthorityDistrict.oid == id
-                )
-            else:
-                mid_query = base_query.filter(
-                    db_repr.OnsLocalAuthorityDistrict.name == name
-                )
+        base_query = (
+            self._streets_query()
+            .join(db_repr.OnsPostcode)
+            .join(db_repr.OnsLocalAuthorityDistrict)
+        )
 
-            final_query = mid_query.distinct(
-                db_repr.SimpleAddress.thoroughfare_or_desc
-            ).with_entities(db_repr.SimpleAddress.thoroughfare_or_desc)
+        if id is not None:
+            final_query = base_query.where(db_repr.OnsLocalAuthorityDistrict.oid == id)
+        else:
+            final_query = base_query.where(
+                db_repr.OnsLocalAuthorityDistrict.name == name
+            )
 
-            df = pd.read_sql(final_query.selectable, self.engine)
-            if len(df.index) == 0:
-                self.logger.debug(f"Found no addresses for local authority {name}")
-            else:
-                dir = self.get_specific_local_authority_folder(name)
-                df.to_csv(str(dir / f"{name} Street Names.csv"))
+        self._write_streets_csv(
+            final_query,
+            lambda: self.get_specific_local_authority_folder(name),
+            name,
+        )
 
     def make_csv_addresses_in_local_authority(
         self,
@@ -345,7 +371,7 @@ class ConstituencyInfoOutputter:
                     db_repr.OnsLocalAuthorityDistrict.name == name
                 )
 
-            df = pd.read_sql(final_query.selectable, self.engine)
+            df = db_repr.read_sql_dataframe(self.engine, final_query.selectable)
             if len(df.index) == 0:
                 self.logger.debug(f"Found no addresses for local_authority {name}")
             else:
@@ -358,6 +384,7 @@ class ConstituencyInfoOutputter:
     ):
         """Make CSV of all postcodes in a westminister constituencies with the % of young people in that postcode"""
         assert len(names) > 0
+        self.constituency_parser.prefetch_constituencies(names)
         with Session(self.engine) as session:
             constituencies: List[db_repr.OnsConstituency] = []
             for name in names:
@@ -392,7 +419,7 @@ class ConstituencyInfoOutputter:
                     .distinct(db_repr.OnsPostcode.postcode)
                 )
 
-                df = pd.read_sql(query.selectable, self.engine)
+                df = db_repr.read_sql_dataframe(self.engine, query.selectable)
                 postcode_dfs.append(df)
 
             combined_df = pd.concat(postcode_dfs, ignore_index=True, sort=False)
@@ -466,7 +493,7 @@ class ConstituencyInfoOutputter:
                     .distinct(db_repr.OnsPostcode.postcode)
                 )
 
-                df = pd.read_sql(query.selectable, self.engine)
+                df = db_repr.read_sql_dataframe(self.engine, query.selectable)
                 postcode_dfs.append(df)
 
             combined_df = pd.concat(postcode_dfs, ignore_index=True, sort=False)
@@ -561,7 +588,7 @@ class ConstituencyInfoOutputter:
                     .filter(db_repr.CensusAgeByOa.oa_id == db_repr.OnsPostcode.oa_id)
                 )
 
-                df = pd.read_sql(query.selectable, self.engine)
+                df = db_repr.read_sql_dataframe(self.engine, query.selectable)
                 addresses_df.append(df)
 
             combined_df = pd.concat(addresses_df, ignore_index=True, sort=False)